@@ -5,8 +5,11 @@ from api.resources.config import config_bp
 from api.resources.jobs import jobs_bp
 from api.resources.ads import ads_bp
 from api.resources.rfmdata import rfmdata
+from db.migrations import run_migrations
 
 def create_app():
+    # Schema (app-owned tables) once at startup, never inside a request
+    run_migrations()
     app = Flask(__name__)
     # =========================
     # REGISTER BLUEPRINTS (Standard Flask style)
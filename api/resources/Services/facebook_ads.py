@@ -51,6 +51,13 @@ def format_to_dataslayer(rows):
     return {"result": data}
 
 def fetch_account_metrics():
+    # Clicks: same metric as before, SUM(results) of ad-level daily insights
+    # over all history. account_daily_insights (level=account "results") is a
+    # different metric and has no history backfill, so it isn't used here.
+    # Reach: de-duplicated account reach over the last INSIGHTS_DAYS window
+    # (account_window_insights, written by every insights run). Until an
+    # account's first run it falls back to the old summed ad-level reach.
+    # Tables come from db.migrations, not from this request.
     return query_dict(""" 
        SELECT 
     a.name AS 'Account name',
@@ -63,14 +70,21 @@ def fetch_account_metrics():
                        AS 'Account status',
     b.amount_spent AS 'Account amount spent',
     'PS' AS 'Business country code',
-    COALESCE(SUM(i.results), 0) AS 'Clicks',
-    COALESCE(SUM(i.reach), 0) AS 'Reach'
+    COALESCE(h.results, 0) AS 'Clicks',
+    COALESCE(w.reach, h.reach, 0) AS 'Reach'
 FROM
     ad_accounts a
         INNER JOIN
     billing b ON b.ad_account_id = a.ad_account_id
-        LEFT JOIN adsets s ON s.ad_account_id = a.ad_account_id
-        LEFT JOIN ads ad ON ad.adset_id = s.adset_id
-        LEFT JOIN ad_daily_insights i ON i.ad_id = ad.ad_id 
-        GROUP BY a.ad_account_id
+        LEFT JOIN (
+            SELECT s.ad_account_id,
+                   SUM(i.results) AS results,
+                   SUM(i.reach) AS reach
+            FROM adsets s
+            JOIN ads ad ON ad.adset_id = s.adset_id
+            JOIN ad_daily_insights i ON i.ad_id = ad.ad_id
+            GROUP BY s.ad_account_id
+        ) h ON h.ad_account_id = a.ad_account_id
+        LEFT JOIN
+    account_window_insights w ON w.ad_account_id = a.ad_account_id
     """)
\ No newline at end of file
@@ -4,11 +4,14 @@ import traceback
 from datetime import datetime
 
 from db.db import query_dict
+from db.repositories.rolling_5d_repo import ensure_rolling_5d_current
 
 # =========================
 # 🔹 جلب البيانات
 # =========================
 def fetch_ads():
+    # 5-day sums are precomputed by the insights ingest (ad_rolling_5d)
+    window_start = ensure_rolling_5d_current()
     rows = query_dict("""
     SELECT 
     a.ad_id,
@@ -17,39 +20,37 @@ def fetch_ads():
     a.campaign_id,
     c.ad_account_id AS account_id,
     acc.currency AS account_currency,
-    SUM(i.spend) AS spend,
-    SUM(i.results) AS results
+    r.spend AS spend,
+    r.results AS results
 FROM
-    ad_daily_insights i
+    ad_rolling_5d r
         JOIN
-    ads a ON a.ad_id = i.ad_id
+    ads a ON a.ad_id = r.ad_id
         JOIN
     campaigns c ON c.campaign_id = a.campaign_id
         LEFT JOIN
     ad_accounts acc ON acc.ad_account_id = c.ad_account_id
 WHERE
-    i.date >= CURDATE() - INTERVAL 5 DAY
+    r.window_start = %s
         AND c.status = 'ACTIVE'
         AND c.effective_status = 'ACTIVE'
         AND c.real_status = 'ACTIVE'
         AND a.status = 'ACTIVE'
         AND a.effective_status = 'ACTIVE'
-GROUP BY a.ad_id
-    """)
+    """, (window_start,))
     return pd.DataFrame(rows)
 
 
 def fetch_avg():
+    window_start = ensure_rolling_5d_current()
     rows = query_dict("""
         SELECT
             c.campaign_id,
-            SUM(i.spend) / NULLIF(SUM(i.results), 0) AS avg_cost
-        FROM ad_daily_insights i
-        JOIN ads a ON a.ad_id = i.ad_id
-        JOIN campaigns c ON c.campaign_id = a.campaign_id
-        WHERE i.date >= CURDATE() - INTERVAL 5 DAY
-        GROUP BY c.campaign_id
-    """)
+            r.spend / NULLIF(r.results, 0) AS avg_cost
+        FROM campaign_rolling_5d r
+        JOIN campaigns c ON c.campaign_id = r.campaign_id
+        WHERE r.window_start = %s
+    """, (window_start,))
     return pd.DataFrame(rows)
 
 
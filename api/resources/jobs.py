@@ -1,8 +1,7 @@
-from threading import Thread
 from flask import Blueprint, request, jsonify
 from db.db import query_dict, execute
-from services.job_service import create_job, get_running_job, update_job_status
-from services.pipeline_runner import run_pipeline_job
+from services.job_service import get_running_job, update_job_status
+from services.trigger_coalescer import trigger_pipeline
 
 # Standard Flask Blueprint
 jobs_bp = Blueprint("jobs", __name__, url_prefix="/api")
@@ -114,8 +113,9 @@ def run_pipeline():
     if include_static_raw is not None:
         include_static = include_static_raw.lower() == "true"
 
-    running_job = get_running_job()
-    if running_job:
+    # Manual run: no min interval, but still one active job at a time
+    res = trigger_pipeline(include_static=include_static, force=True)
+    if not res["created"]:
         return jsonify({
             "error": {
                 "message": "Another job is already running",
@@ -123,20 +123,7 @@ def run_pipeline():
             }
         }), 409
 
-    job_id = create_job(include_static=include_static)
-    update_job_status(job_id, "RUNNING")
-
-    job = {
-        "id": job_id,
-        "include_static": include_static
-    }
-
-    Thread(
-        target=run_pipeline_job,
-        args=(job,),
-        daemon=True
-    ).start()
-
+    # Queued as PENDING; workers.pipeline_daemon runs it
     return jsonify({
-        "job_id": job_id
+        "job_id": res["job_id"]
     }), 202
\ No newline at end of file
@@ -1,11 +1,9 @@
-from threading import Thread
 from flask import Blueprint, request, jsonify
 from api.resources.Services.facebook_ads import fetch_account_metrics, format_to_dataslayer
 from api.resources.Services.facebook_insights import format_posts_to_dataslayer, fetch_facebook_insights
 from api.resources.Services.instagram_ads import fetch_instagram_insights, format_instagram_to_dataslayer
 from db.db import query_dict, execute
-from services.job_service import cleanup_stuck_jobs, create_job, get_running_job, update_job_status
-from services.pipeline_runner import run_pipeline_job
+from services.trigger_coalescer import trigger_pipeline
 
 # Standard Flask Blueprint
 rfmdata = Blueprint("rfmdata", __name__, url_prefix="/api")
@@ -16,31 +14,8 @@ def get_facebook_metrics(token):
 
     include_static = None
 
-    # Cleanup stuck jobs
-    cleanup_stuck_jobs()
-
-    # Check if a job is already running
-    running_job = get_running_job()
-
-    if not running_job:
-
-        job_id = create_job(include_static=include_static)
-
-        job_context = {
-            "id": job_id,
-            "include_static": include_static
-        }
-
-        try:
-            Thread(
-                target=run_pipeline_job,
-                args=(job_context,),
-                daemon=True
-            ).start()
-
-        except Exception as e:
-            update_job_status(job_id, "FAILED", str(e))
-            raise
+    # Start a job unless one is active / ran recently (bursts of refreshes coalesce)
+    trigger_pipeline(include_static=include_static)
 
     # Return existing data immediately
     try:
@@ -6,11 +6,14 @@ from mysql.connector import errors
 from config.config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
 from logs.logger import logger
 import time
+from threading import Lock
 
 ParamsType = Optional[Union[Dict[str, Any], Sequence[Any]]]
 
 _POOL: Optional[pooling.MySQLConnectionPool] = None
 
+DB_POOL_SIZE = 32  # MAX allowed by mysql-connector
+
 
 # =========================
 # POOL INITIALIZATION
@@ -26,7 +29,7 @@ def _get_pool() -> pooling.MySQLConnectionPool:
 
             _POOL = pooling.MySQLConnectionPool(
                 pool_name="metaads_pool",
-                pool_size=32,  # MAX allowed by mysql-connector
+                pool_size=DB_POOL_SIZE,
 
                 host=DB_HOST,
                 port=DB_PORT,
@@ -40,7 +43,7 @@ def _get_pool() -> pooling.MySQLConnectionPool:
                 use_pure=True,
             )
 
-            logger.info("MySQL connection pool initialized successfully (size=32).")
+            logger.info(f"MySQL connection pool initialized successfully (size={DB_POOL_SIZE}).")
 
         except Exception:
             logger.error("❌ Failed to initialize MySQL pool", exc_info=True)
@@ -208,6 +211,85 @@ def query_scalar(sql: str, params: ParamsType = None) -> Any:
             cur.close()
         conn.close()
 
+
+# =========================
+# APP-OWNED TABLES (CREATE ONCE PER PROCESS)
+# =========================
+_READY_TABLES: set = set()
+_READY_LOCK = Lock()
+
+
+def ensure_table(name: str, ddl: str) -> None:
+    """
+    Runs a CREATE TABLE IF NOT EXISTS statement the first time `name` is used
+    in this process. Only for tables introduced by the sync code itself.
+    """
+    if name in _READY_TABLES:
+        return
+
+    with _READY_LOCK:
+        if name in _READY_TABLES:
+            return
+        execute(ddl)
+        _READY_TABLES.add(name)
+
+
+def ensure_index(table: str, index_name: str, columns: str, unique: bool = False) -> None:
+    """
+    Adds `index_name` on `table` (columns e.g. "ad_account_id, last_seen_at")
+    if information_schema doesn't list it yet. Checked once per process.
+    """
+    key = f"{table}.{index_name}"
+    if key in _READY_TABLES:
+        return
+
+    with _READY_LOCK:
+        if key in _READY_TABLES:
+            return
+        exists = query_scalar(
+            """
+            SELECT COUNT(*)
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE()
+              AND table_name = %s
+              AND index_name = %s
+            """,
+            (table, index_name),
+        )
+        if not exists:
+            logger.info(f"🧱 adding index {index_name} on {table}({columns})")
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            execute(f"ALTER TABLE {table} ADD {kind} {index_name} ({columns})")
+        _READY_TABLES.add(key)
+
+
+def ensure_column(table: str, column: str, definition: str) -> None:
+    """
+    Adds `column` (e.g. definition "CHAR(64) NULL") to an existing table if
+    information_schema doesn't list it yet. Checked once per process.
+    """
+    key = f"{table}.{column}"
+    if key in _READY_TABLES:
+        return
+
+    with _READY_LOCK:
+        if key in _READY_TABLES:
+            return
+        exists = query_scalar(
+            """
+            SELECT COUNT(*)
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+              AND table_name = %s
+              AND column_name = %s
+            """,
+            (table, column),
+        )
+        if not exists:
+            logger.info(f"🧱 adding column {column} to {table}")
+            execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        _READY_TABLES.add(key)
+
 # from typing import Any, Dict, List, Optional, Iterable, Union, Sequence
 # import mysql.connector
 # from mysql.connector import Error
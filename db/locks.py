@@ -0,0 +1,201 @@
+# db/locks.py
+"""
+Cross-process named locks on MySQL GET_LOCK / RELEASE_LOCK.
+
+GET_LOCK is session-scoped, so each held lock pins one pooled connection
+until release. If the process dies the session ends and MySQL frees the
+lock, so a crashed worker can never leave an account locked forever.
+"""
+import itertools
+import os
+import time
+from threading import Lock
+from typing import Dict
+
+from db.db import get_connection
+from logs.logger import logger
+
+
+class LockTimeoutError(Exception):
+    pass
+
+
+# =========================
+# METRICS
+# =========================
+_METRICS: Dict[str, float] = {
+    "acquired": 0,
+    "timeouts": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "held_seconds_total": 0.0,
+}
+_METRICS_LOCK = Lock()
+
+# Open measurement windows (start_lock_window): id -> metrics since start
+_WINDOWS: Dict[int, Dict[str, float]] = {}
+_NEXT_WINDOW = itertools.count(1)
+
+
+def _record(name: str, value: float) -> None:
+    with _METRICS_LOCK:
+        for metrics in (_METRICS, *_WINDOWS.values()):
+            if name.endswith("_max"):
+                metrics[name] = max(metrics[name], value)
+            else:
+                metrics[name] += value
+
+
+def lock_metrics() -> Dict[str, float]:
+    """Cumulative for the whole process."""
+    with _METRICS_LOCK:
+        return dict(_METRICS)
+
+
+def start_lock_window() -> int:
+    """Start counting lock metrics for one run; pass the id to end_lock_window."""
+    with _METRICS_LOCK:
+        window_id = next(_NEXT_WINDOW)
+        _WINDOWS[window_id] = {name: 0.0 for name in _METRICS}
+        return window_id
+
+
+def end_lock_window(window_id: int) -> Dict[str, float]:
+    """Metrics recorded in this process since start_lock_window (incl. max wait)."""
+    with _METRICS_LOCK:
+        return _WINDOWS.pop(window_id, {name: 0.0 for name in _METRICS})
+
+
+# =========================
+# LOCK
+# =========================
+class MySQLNamedLock:
+    """
+    with MySQLNamedLock("meta_sync:act_1", timeout=300): ...
+
+    timeout = max seconds to wait for the lock (GET_LOCK lease wait);
+    raises LockTimeoutError if another session still holds it.
+    """
+
+    def __init__(self, name: str, timeout: int = 300):
+        # MySQL limits lock names to 64 characters
+        self.name = name[:64]
+        self.timeout = timeout
+        self._conn = None
+        self._acquired_at = None
+
+    def acquire(self) -> None:
+        conn = get_connection()
+        started = time.monotonic()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT GET_LOCK(%s, %s)", (self.name, self.timeout))
+            (ok,) = cur.fetchone()
+            cur.close()
+        except Exception:
+            conn.close()
+            raise
+
+        waited = time.monotonic() - started
+        _record("wait_seconds_total", waited)
+        _record("wait_seconds_max", waited)
+
+        if ok != 1:
+            conn.close()
+            _record("timeouts", 1)
+            logger.warning(f"⏳ lock timeout name={self.name} waited={waited:.1f}s")
+            raise LockTimeoutError(f"Could not acquire lock {self.name} within {self.timeout}s")
+
+        _record("acquired", 1)
+        if waited >= 1:
+            logger.info(f"🔒 lock acquired name={self.name} waited={waited:.1f}s")
+        self._conn = conn
+        self._acquired_at = time.monotonic()
+
+    def release(self) -> None:
+        conn = self._conn
+        if conn is None:
+            return
+        self._conn = None
+        _record("held_seconds_total", time.monotonic() - self._acquired_at)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT RELEASE_LOCK(%s)", (self.name,))
+            cur.fetchone()
+            cur.close()
+        except Exception as e:
+            # Closing the session below frees the lock anyway
+            logger.warning(f"⚠️ RELEASE_LOCK failed name={self.name}: {e}")
+        finally:
+            conn.close()
+
+    def is_held(self) -> bool:
+        """True while our session still owns the lock (also keeps it alive)."""
+        conn = self._conn
+        if conn is None:
+            return False
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (self.name,))
+            (held,) = cur.fetchone()
+            cur.close()
+            return held == 1
+        except Exception as e:
+            logger.warning(f"⚠️ lock check failed name={self.name}: {e}")
+            return False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+# =========================
+# ACCOUNT LOCKS
+# =========================
+# mysql = GET_LOCK, shared by every process/host; local = in-process only
+ACCOUNT_LOCK_PROVIDER = os.getenv("ACCOUNT_LOCK_PROVIDER", "mysql").lower()
+ACCOUNT_LOCK_TIMEOUT = int(os.getenv("ACCOUNT_LOCK_TIMEOUT_SECONDS", "300"))
+
+_LOCAL_LOCKS: Dict[int, Lock] = {}
+_LOCAL_LOCKS_GUARD = Lock()
+
+
+class _LocalAccountLock:
+    """In-process stand-in with the same timeout semantics as MySQLNamedLock."""
+
+    def __init__(self, lock: Lock, name: str, timeout: int):
+        self._lock = lock
+        self.name = name
+        self.timeout = timeout
+
+    def __enter__(self):
+        if not self._lock.acquire(timeout=self.timeout):
+            _record("timeouts", 1)
+            raise LockTimeoutError(f"Could not acquire lock {self.name} within {self.timeout}s")
+        _record("acquired", 1)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._lock.release()
+        return False
+
+
+def get_account_lock(ad_account_id, timeout: int = None):
+    """
+    The per-account sync lock: held by the entities sync for the whole
+    account and by the scheduler around each refresh it runs.
+    """
+    name = f"meta_sync:act_{ad_account_id}"
+    timeout = ACCOUNT_LOCK_TIMEOUT if timeout is None else timeout
+
+    if ACCOUNT_LOCK_PROVIDER == "mysql":
+        # New object per call: each holder pins its own DB session
+        return MySQLNamedLock(name, timeout=timeout)
+
+    with _LOCAL_LOCKS_GUARD:
+        lock = _LOCAL_LOCKS.setdefault(int(ad_account_id), Lock())
+    return _LocalAccountLock(lock, name, timeout)
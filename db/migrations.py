@@ -0,0 +1,32 @@
+# db/migrations.py
+"""
+One-off schema setup for tables/indexes owned by the sync code:
+
+    python -m db.migrations
+
+Also run once at API / daemon startup, so request handlers and worker
+threads never issue DDL themselves. Every step is idempotent.
+"""
+from logs.logger import logger
+from db.repositories.account_daily_insights_repo import (
+    ensure_account_daily_insights_table,
+    ensure_account_window_insights_table,
+)
+from db.repositories.creative_specs_repo import ensure_creative_specs_schema
+from db.repositories.pipeline_jobs_repo import ensure_single_active_job_schema
+from db.repositories.rolling_5d_repo import ensure_rolling_5d_tables
+from services.reconcile_service import ensure_reconcile_indexes
+
+
+def run_migrations() -> None:
+    ensure_single_active_job_schema()
+    ensure_account_daily_insights_table()
+    ensure_account_window_insights_table()
+    ensure_reconcile_indexes()
+    ensure_creative_specs_schema()
+    ensure_rolling_5d_tables()
+    logger.info("✅ schema migrations applied")
+
+
+if __name__ == "__main__":
+    run_migrations()
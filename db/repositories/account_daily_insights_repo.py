@@ -0,0 +1,74 @@
+# db/repositories/account_daily_insights_repo.py
+from db.db import ensure_table, execute
+
+ACCOUNT_DAILY_INSIGHTS_DDL = """
+CREATE TABLE IF NOT EXISTS account_daily_insights (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    ad_account_id BIGINT NOT NULL,
+    date DATE NOT NULL,
+    results INT NULL,
+    cost_per_result DECIMAL(14,4) NULL,
+    spend DECIMAL(14,4) NULL,
+    impressions BIGINT NULL,
+    reach BIGINT NULL,
+    frequency DECIMAL(10,4) NULL,
+    checked_at DATETIME NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY uq_account_daily_insights (ad_account_id, date)
+)
+"""
+
+
+def ensure_account_daily_insights_table() -> None:
+    """
+    account_daily_insights has UNIQUE(ad_account_id, date)
+    Filled from level=account insights (reach is de-duplicated by Meta).
+    """
+    ensure_table("account_daily_insights", ACCOUNT_DAILY_INSIGHTS_DDL)
+
+
+# Reach is only de-duplicated inside one Graph request, so daily rows can't
+# be summed into it. One row per account holds reach for the whole window.
+ACCOUNT_WINDOW_INSIGHTS_DDL = """
+CREATE TABLE IF NOT EXISTS account_window_insights (
+    ad_account_id BIGINT NOT NULL,
+    window_days INT NOT NULL,
+    date_start DATE NULL,
+    date_stop DATE NULL,
+    reach BIGINT NULL,
+    impressions BIGINT NULL,
+    checked_at DATETIME NOT NULL,
+    PRIMARY KEY (ad_account_id)
+)
+"""
+
+
+def ensure_account_window_insights_table() -> None:
+    """account_window_insights: de-duplicated account reach over the last window_days."""
+    ensure_table("account_window_insights", ACCOUNT_WINDOW_INSIGHTS_DDL)
+
+
+def upsert_account_window_insights(ad_account_id: int, window_days: int, row: dict) -> None:
+    ensure_account_window_insights_table()
+    execute(
+        """
+        INSERT INTO account_window_insights (
+            ad_account_id, window_days, date_start, date_stop, reach, impressions, checked_at
+        ) VALUES (%s, %s, %s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            window_days=VALUES(window_days),
+            date_start=VALUES(date_start),
+            date_stop=VALUES(date_stop),
+            reach=VALUES(reach),
+            impressions=VALUES(impressions),
+            checked_at=NOW()
+        """,
+        (
+            ad_account_id,
+            window_days,
+            row.get("date_start"),
+            row.get("date_stop"),
+            int(row.get("reach") or 0),
+            int(row.get("impressions") or 0),
+        ),
+    )
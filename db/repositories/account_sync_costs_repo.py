@@ -0,0 +1,66 @@
+# db/repositories/account_sync_costs_repo.py
+from typing import Dict
+
+from db.db import ensure_table, execute, query_dict
+
+ACCOUNT_SYNC_COSTS_DDL = """
+CREATE TABLE IF NOT EXISTS account_sync_costs (
+    kind VARCHAR(32) NOT NULL,
+    ad_account_id BIGINT NOT NULL,
+    est_seconds DECIMAL(12,3) NOT NULL,
+    last_seconds DECIMAL(12,3) NOT NULL,
+    last_rows INT NOT NULL,
+    last_api_calls INT NOT NULL,
+    runs INT NOT NULL,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (kind, ad_account_id)
+)
+"""
+
+
+def ensure_account_sync_costs_table() -> None:
+    """
+    Per (kind, account) run history used by services/sync_planner.py.
+    est_seconds is an exponentially weighted average of run durations.
+    """
+    ensure_table("account_sync_costs", ACCOUNT_SYNC_COSTS_DDL)
+
+
+def get_costs(kind: str) -> Dict[int, dict]:
+    ensure_account_sync_costs_table()
+    rows = query_dict(
+        """
+        SELECT ad_account_id, est_seconds, last_rows, last_api_calls, runs
+        FROM account_sync_costs
+        WHERE kind = %(kind)s
+        """,
+        {"kind": kind},
+    )
+    return {int(r["ad_account_id"]): r for r in rows}
+
+
+def record_cost(kind: str, ad_account_id: int, seconds: float, rows: int, api_calls: int, alpha: float) -> None:
+    ensure_account_sync_costs_table()
+    execute(
+        """
+        INSERT INTO account_sync_costs
+            (kind, ad_account_id, est_seconds, last_seconds, last_rows, last_api_calls, runs, updated_at)
+        VALUES
+            (%(kind)s, %(id)s, %(seconds)s, %(seconds)s, %(rows)s, %(calls)s, 1, NOW())
+        ON DUPLICATE KEY UPDATE
+            est_seconds = est_seconds * (1 - %(alpha)s) + VALUES(last_seconds) * %(alpha)s,
+            last_seconds = VALUES(last_seconds),
+            last_rows = VALUES(last_rows),
+            last_api_calls = VALUES(last_api_calls),
+            runs = runs + 1,
+            updated_at = NOW()
+        """,
+        {
+            "kind": kind,
+            "id": ad_account_id,
+            "seconds": round(seconds, 3),
+            "rows": rows,
+            "calls": api_calls,
+            "alpha": alpha,
+        },
+    )
@@ -0,0 +1,65 @@
+# db/repositories/ad_hourly_insights_repo.py
+from db.db import ensure_table, execute, execute_many
+from services._insights_batch import FP_SCALE
+
+AD_HOURLY_INSIGHTS_DDL = """
+CREATE TABLE IF NOT EXISTS ad_hourly_insights (
+    ad_id BIGINT NOT NULL,
+    date DATE NOT NULL,
+    hour TINYINT UNSIGNED NOT NULL,
+    spend DECIMAL(14,4) NULL,
+    impressions INT NULL,
+    results INT NULL,
+    checked_at DATETIME NOT NULL,
+    PRIMARY KEY (ad_id, date, hour),
+    KEY idx_ad_hourly_insights_date (date)
+)
+"""
+
+
+def ensure_ad_hourly_insights_table() -> None:
+    """
+    ad_hourly_insights: PRIMARY KEY (ad_id, date, hour)
+    Intraday only, in the ad account's time zone.
+    """
+    ensure_table("ad_hourly_insights", AD_HOURLY_INSIGHTS_DDL)
+
+
+def upsert_ad_hourly_insights_batch(cols: dict) -> int:
+    """
+    Multi-row upsert of a page from transform_insights_page(..., hourly=True).
+    """
+    ids = cols["ids"]
+    if not ids:
+        return 0
+
+    ensure_ad_hourly_insights_table()
+
+    rows = sorted(zip(
+        ids, cols["dates"], cols["hours"],
+        cols["spend_fp"], cols["impressions"], cols["results"],
+    ))
+
+    sql = f"""
+    INSERT INTO ad_hourly_insights (
+        ad_id, date, hour, spend, impressions, results, checked_at
+    ) VALUES (
+        %s, %s, %s, %s / {FP_SCALE}, %s, %s, NOW()
+    )
+    ON DUPLICATE KEY UPDATE
+        spend=VALUES(spend),
+        impressions=VALUES(impressions),
+        results=VALUES(results),
+        checked_at=NOW();
+    """
+    execute_many(sql, rows)
+    return len(rows)
+
+
+def purge_ad_hourly_insights(keep_days: int = 7) -> int:
+    """Hourly rows are only for pacing; daily tables keep the history."""
+    ensure_ad_hourly_insights_table()
+    return execute(
+        "DELETE FROM ad_hourly_insights WHERE date < CURDATE() - INTERVAL %s DAY",
+        (keep_days,),
+    )
@@ -0,0 +1,111 @@
+# db/repositories/creative_specs_repo.py
+"""
+Content-addressed store for creative object_story_spec.
+
+Each distinct spec is kept once in creative_specs, keyed by the sha256 of
+its canonical JSON and stored zlib-compressed; creative_ads.spec_hash
+points at it. A spec is never rewritten once stored. Rows synced before
+spec_hash existed still hold the inline creative_sourcing_spec until their
+next sync; load_creative_spec reads either.
+"""
+import hashlib
+import json
+import zlib
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from db.db import ensure_column, ensure_table, execute_many, query_dict, query_one
+
+CREATIVE_SPECS_DDL = """
+CREATE TABLE IF NOT EXISTS creative_specs (
+    spec_hash CHAR(64) NOT NULL,
+    spec_zlib MEDIUMBLOB NOT NULL,
+    raw_bytes INT NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (spec_hash)
+)
+"""
+
+# Hashes known to be stored (per process, bounded)
+_KNOWN_MAX = 50000
+_KNOWN: set = set()
+_KNOWN_LOCK = Lock()
+
+
+def ensure_creative_specs_schema() -> None:
+    ensure_table("creative_specs", CREATIVE_SPECS_DDL)
+    ensure_column("creative_ads", "spec_hash", "CHAR(64) NULL")
+
+
+def canonical_spec(spec: Any) -> Optional[Tuple[str, bytes]]:
+    """spec -> (sha256 hex, canonical JSON bytes); None for empty specs."""
+    if not spec:
+        return None
+    raw = json.dumps(spec, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest(), raw
+
+
+def store_specs(specs: Dict[str, bytes]) -> int:
+    """
+    specs: {spec_hash: canonical bytes}. Inserts only hashes not stored yet;
+    returns how many new specs were written.
+    """
+    with _KNOWN_LOCK:
+        pending = {h: raw for h, raw in specs.items() if h not in _KNOWN}
+    if not pending:
+        return 0
+
+    hashes = sorted(pending)
+    in_list = ",".join(["%s"] * len(hashes))
+    existing = {
+        r["spec_hash"]
+        for r in query_dict(
+            f"SELECT spec_hash FROM creative_specs WHERE spec_hash IN ({in_list})",
+            tuple(hashes),
+        )
+    }
+
+    rows = [
+        (h, zlib.compress(pending[h], 6), len(pending[h]))
+        for h in hashes
+        if h not in existing
+    ]
+    CHUNK_SIZE = 50
+    for i in range(0, len(rows), CHUNK_SIZE):
+        execute_many(
+            """
+            INSERT IGNORE INTO creative_specs (spec_hash, spec_zlib, raw_bytes, created_at)
+            VALUES (%s, %s, %s, NOW())
+            """,
+            rows[i:i + CHUNK_SIZE],
+        )
+
+    with _KNOWN_LOCK:
+        if len(_KNOWN) > _KNOWN_MAX:
+            _KNOWN.clear()
+        _KNOWN.update(hashes)
+    return len(rows)
+
+
+def load_spec(spec_hash: str) -> Optional[dict]:
+    row = query_one(
+        "SELECT spec_zlib FROM creative_specs WHERE spec_hash = %s",
+        (spec_hash,),
+    )
+    if not row:
+        return None
+    return json.loads(zlib.decompress(row["spec_zlib"]).decode("utf-8"))
+
+
+def load_creative_spec(creative_id: int) -> Optional[dict]:
+    """object_story_spec of a creative: creative_specs by hash, else the legacy inline copy."""
+    row = query_one(
+        "SELECT spec_hash, creative_sourcing_spec FROM creative_ads WHERE creative_id = %s",
+        (creative_id,),
+    )
+    if not row:
+        return None
+    if row["spec_hash"]:
+        return load_spec(row["spec_hash"])
+    inline = row["creative_sourcing_spec"]
+    return json.loads(inline) if inline else None
@@ -0,0 +1,83 @@
+# db/repositories/job_progress_repo.py
+"""
+Per-job completion state so a retried pipeline job resumes instead of
+starting over: whole steps (ad_account_id = 0) and single accounts inside
+account-granular steps. Only completions newer than the resume window
+(PIPELINE_RESUME_WINDOW_HOURS) count, so stale progress is redone.
+"""
+import os
+from typing import Iterable, List, Set
+
+from db.db import ensure_table, execute, query_dict
+
+RESUME_WINDOW_HOURS = int(os.getenv("PIPELINE_RESUME_WINDOW_HOURS", "24"))
+
+PIPELINE_JOB_PROGRESS_DDL = """
+CREATE TABLE IF NOT EXISTS pipeline_job_progress (
+    job_id BIGINT NOT NULL,
+    step VARCHAR(32) NOT NULL,
+    ad_account_id BIGINT NOT NULL DEFAULT 0,
+    completed_at DATETIME NOT NULL,
+    PRIMARY KEY (job_id, step, ad_account_id)
+)
+"""
+
+STEP_SCOPE = 0
+
+
+def ensure_job_progress_table() -> None:
+    ensure_table("pipeline_job_progress", PIPELINE_JOB_PROGRESS_DDL)
+
+
+def _mark(job_id: int, step: str, ad_account_id: int) -> None:
+    ensure_job_progress_table()
+    execute(
+        """
+        INSERT INTO pipeline_job_progress (job_id, step, ad_account_id, completed_at)
+        VALUES (%s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE completed_at = NOW()
+        """,
+        (job_id, step, ad_account_id),
+    )
+
+
+def mark_step_done(job_id: int, step: str) -> None:
+    _mark(job_id, step, STEP_SCOPE)
+
+
+def mark_account_done(job_id, step: str, ad_account_id: int) -> None:
+    if job_id:
+        _mark(job_id, step, int(ad_account_id))
+
+
+def completed_steps(job_id: int) -> Set[str]:
+    ensure_job_progress_table()
+    rows = query_dict(
+        """
+        SELECT step
+        FROM pipeline_job_progress
+        WHERE job_id = %s AND ad_account_id = 0
+          AND completed_at >= NOW() - INTERVAL %s HOUR
+        """,
+        (job_id, RESUME_WINDOW_HOURS),
+    )
+    return {r["step"] for r in rows}
+
+
+def skip_completed_accounts(job_id, step: str, accounts: Iterable[dict]) -> List[dict]:
+    """Drop accounts this job already finished for `step` (no-op outside a job)."""
+    accounts = list(accounts)
+    if not job_id:
+        return accounts
+    ensure_job_progress_table()
+    rows = query_dict(
+        """
+        SELECT ad_account_id
+        FROM pipeline_job_progress
+        WHERE job_id = %s AND step = %s AND ad_account_id <> 0
+          AND completed_at >= NOW() - INTERVAL %s HOUR
+        """,
+        (job_id, step, RESUME_WINDOW_HOURS),
+    )
+    done = {int(r["ad_account_id"]) for r in rows}
+    return [a for a in accounts if int(a["ad_account_id"]) not in done]
@@ -0,0 +1,39 @@
+# db/repositories/pipeline_jobs_repo.py
+"""
+Single-flight guard for pipeline_jobs.
+
+active_slot is a stored generated column that is 1 while a job is PENDING
+or RUNNING and NULL otherwise. A UNIQUE index on it allows at most one
+active job: a second INSERT (or a retry flipping an old job back to
+PENDING) fails with a duplicate-key error instead of racing in.
+
+The schema is applied by db.migrations, never from a request.
+"""
+from db.db import ensure_column, ensure_index, execute
+from logs.logger import logger
+
+
+def ensure_single_active_job_schema() -> None:
+    ensure_column(
+        "pipeline_jobs",
+        "active_slot",
+        "TINYINT AS (IF(status IN ('PENDING','RUNNING'), 1, NULL)) STORED",
+    )
+    # Old rows may already hold several active jobs; keep the newest so the
+    # unique index can be built
+    superseded = execute("""
+        UPDATE pipeline_jobs j
+        JOIN (
+            SELECT MAX(id) AS keep_id
+            FROM pipeline_jobs
+            WHERE status IN ('PENDING','RUNNING')
+        ) k
+        SET j.status='FAILED',
+            j.error_message='Superseded',
+            j.finished_at=NOW()
+        WHERE j.status IN ('PENDING','RUNNING')
+          AND j.id <> k.keep_id
+    """)
+    if superseded:
+        logger.warning(f"⚠️ marked {superseded} duplicate active jobs FAILED")
+    ensure_index("pipeline_jobs", "uq_pipeline_jobs_active", "active_slot", unique=True)
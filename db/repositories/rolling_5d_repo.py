@@ -0,0 +1,201 @@
+# db/repositories/rolling_5d_repo.py
+"""
+5-day rolling spend/results rollups used by the high/low cost endpoints.
+
+Window = day - INTERVAL 5 DAY .. day (same as the old ad-hoc queries), where
+day is the MySQL server's CURDATE() at the time of the roll. rolling_5d_state
+holds the day the tables were last fully rolled for; readers filter on that
+window_start, so one clock (the server's) decides what "current" means.
+Rows whose window_start is older are stale and are dropped on the daily roll.
+"""
+from datetime import date, timedelta
+from threading import Lock
+from typing import Iterable
+
+from db.db import ensure_table, execute, query_one
+from logs.logger import logger
+
+AD_ROLLING_5D_DDL = """
+CREATE TABLE IF NOT EXISTS ad_rolling_5d (
+    ad_id BIGINT NOT NULL,
+    campaign_id BIGINT NULL,
+    spend DECIMAL(16,4) NULL,
+    results BIGINT NULL,
+    window_start DATE NOT NULL,
+    refreshed_at DATETIME NOT NULL,
+    PRIMARY KEY (ad_id),
+    KEY idx_ad_rolling_5d_campaign (campaign_id, window_start),
+    KEY idx_ad_rolling_5d_window (window_start)
+)
+"""
+
+CAMPAIGN_ROLLING_5D_DDL = """
+CREATE TABLE IF NOT EXISTS campaign_rolling_5d (
+    campaign_id BIGINT NOT NULL,
+    spend DECIMAL(16,4) NULL,
+    results BIGINT NULL,
+    window_start DATE NOT NULL,
+    refreshed_at DATETIME NOT NULL,
+    PRIMARY KEY (campaign_id),
+    KEY idx_campaign_rolling_5d_window (window_start)
+)
+"""
+
+# Single row (id = 1): the server date the rollups were last fully rebuilt for
+ROLLING_5D_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS rolling_5d_state (
+    id TINYINT NOT NULL,
+    rolled_for DATE NOT NULL,
+    rolled_at DATETIME NOT NULL,
+    PRIMARY KEY (id)
+)
+"""
+
+_ROLL_LOCK = Lock()
+
+
+def ensure_rolling_5d_tables() -> None:
+    ensure_table("ad_rolling_5d", AD_ROLLING_5D_DDL)
+    ensure_table("campaign_rolling_5d", CAMPAIGN_ROLLING_5D_DDL)
+    ensure_table("rolling_5d_state", ROLLING_5D_STATE_DDL)
+
+
+def _in_list(ids: list) -> str:
+    return ",".join(["%s"] * len(ids))
+
+
+def rebuild_rolling_5d(day: date) -> None:
+    """
+    Full recompute of both rollups for the window ending on `day`, then
+    records `day` in rolling_5d_state. Runs once per server day
+    (see ensure_rolling_5d_current), not per request.
+    """
+    execute(
+        """
+        INSERT INTO ad_rolling_5d (ad_id, campaign_id, spend, results, window_start, refreshed_at)
+        SELECT i.ad_id, a.campaign_id, SUM(i.spend), SUM(i.results),
+               %(day)s - INTERVAL 5 DAY, NOW()
+        FROM ad_daily_insights i
+        JOIN ads a ON a.ad_id = i.ad_id
+        WHERE i.date >= %(day)s - INTERVAL 5 DAY
+        GROUP BY i.ad_id, a.campaign_id
+        ON DUPLICATE KEY UPDATE
+            campaign_id = VALUES(campaign_id),
+            spend = VALUES(spend),
+            results = VALUES(results),
+            window_start = VALUES(window_start),
+            refreshed_at = NOW()
+        """,
+        {"day": day},
+    )
+    execute(
+        "DELETE FROM ad_rolling_5d WHERE window_start < %(day)s - INTERVAL 5 DAY",
+        {"day": day},
+    )
+
+    execute(
+        """
+        INSERT INTO campaign_rolling_5d (campaign_id, spend, results, window_start, refreshed_at)
+        SELECT campaign_id, SUM(spend), SUM(results), window_start, NOW()
+        FROM ad_rolling_5d
+        WHERE campaign_id IS NOT NULL
+          AND window_start = %(day)s - INTERVAL 5 DAY
+        GROUP BY campaign_id, window_start
+        ON DUPLICATE KEY UPDATE
+            spend = VALUES(spend),
+            results = VALUES(results),
+            window_start = VALUES(window_start),
+            refreshed_at = NOW()
+        """,
+        {"day": day},
+    )
+    execute(
+        "DELETE FROM campaign_rolling_5d WHERE window_start < %(day)s - INTERVAL 5 DAY",
+        {"day": day},
+    )
+
+    # Only after the rebuild succeeded: a failed roll is retried by the next caller
+    execute(
+        """
+        INSERT INTO rolling_5d_state (id, rolled_for, rolled_at)
+        VALUES (1, %(day)s, NOW())
+        ON DUPLICATE KEY UPDATE
+            rolled_for = GREATEST(rolled_for, VALUES(rolled_for)),
+            rolled_at = NOW()
+        """,
+        {"day": day},
+    )
+    logger.info(f"✅ rolling 5d rollups rebuilt for {day}")
+
+
+def ensure_rolling_5d_current() -> date:
+    """
+    Rolls the window forward when the server day changes and returns the
+    window_start readers should filter on. One primary-key read otherwise.
+    """
+    state = query_one(
+        """
+        SELECT CURDATE() AS today,
+               (SELECT rolled_for FROM rolling_5d_state WHERE id = 1) AS rolled_for
+        """
+    )
+    today = state["today"]
+    if state["rolled_for"] is None or state["rolled_for"] < today:
+        with _ROLL_LOCK:
+            # another thread may have rolled while we waited
+            rolled_for = (query_one(
+                "SELECT rolled_for FROM rolling_5d_state WHERE id = 1"
+            ) or {}).get("rolled_for")
+            if rolled_for is None or rolled_for < today:
+                rebuild_rolling_5d(today)
+    return today - timedelta(days=5)
+
+
+def refresh_rolling_5d_for_ads(ad_ids: Iterable[int]) -> None:
+    """
+    Incremental refresh for ads whose (ad, date) insights were just written
+    inside the window, then for their campaigns.
+    """
+    ids = sorted(set(int(x) for x in ad_ids))
+    if not ids:
+        return
+
+    window_start = ensure_rolling_5d_current()
+
+    execute(
+        f"""
+        INSERT INTO ad_rolling_5d (ad_id, campaign_id, spend, results, window_start, refreshed_at)
+        SELECT i.ad_id, a.campaign_id, SUM(i.spend), SUM(i.results), %s, NOW()
+        FROM ad_daily_insights i
+        JOIN ads a ON a.ad_id = i.ad_id
+        WHERE i.ad_id IN ({_in_list(ids)})
+          AND i.date >= %s
+        GROUP BY i.ad_id, a.campaign_id
+        ON DUPLICATE KEY UPDATE
+            campaign_id = VALUES(campaign_id),
+            spend = VALUES(spend),
+            results = VALUES(results),
+            window_start = VALUES(window_start),
+            refreshed_at = NOW()
+        """,
+        (window_start, *ids, window_start),
+    )
+
+    execute(
+        f"""
+        INSERT INTO campaign_rolling_5d (campaign_id, spend, results, window_start, refreshed_at)
+        SELECT r.campaign_id, SUM(r.spend), SUM(r.results), r.window_start, NOW()
+        FROM ad_rolling_5d r
+        WHERE r.campaign_id IN (
+                SELECT DISTINCT campaign_id FROM ads WHERE ad_id IN ({_in_list(ids)})
+              )
+          AND r.window_start = %s
+        GROUP BY r.campaign_id, r.window_start
+        ON DUPLICATE KEY UPDATE
+            spend = VALUES(spend),
+            results = VALUES(results),
+            window_start = VALUES(window_start),
+            refreshed_at = NOW()
+        """,
+        (*ids, window_start),
+    )
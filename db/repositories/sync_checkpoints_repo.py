@@ -1,6 +1,8 @@
 # db/repositories/sync_checkpoints_repo.py
+from datetime import datetime
 from typing import Optional
 from db.db import query_dict, execute
+from utils.datetime_utils import to_utc, to_mysql_naive_utc
 
 def get_last_success(entity: str, scope_key: str) -> Optional[str]:
     rows = query_dict(
@@ -26,3 +28,58 @@ def set_last_success(entity: str, scope_key: str) -> None:
         """,
         {"entity": entity, "scope_key": scope_key},
     )
+
+# =========================
+# updated_time high-water marks
+# =========================
+# Stored in the same table under entity "<entity>.updated_time" so the
+# existing (entity, scope_key) key is reused; last_success_at holds the
+# max updated_time (UTC) seen by a successful sync.
+
+def _hwm_entity(entity: str) -> str:
+    return f"{entity}.updated_time"
+
+def get_high_water(entity: str, scope_key: str) -> Optional[datetime]:
+    rows = query_dict(
+        """
+        SELECT last_success_at
+        FROM sync_checkpoints
+        WHERE entity=%(entity)s AND scope_key=%(scope_key)s
+        LIMIT 1
+        """,
+        {"entity": _hwm_entity(entity), "scope_key": scope_key},
+    )
+    if not rows or not rows[0]["last_success_at"]:
+        return None
+    return to_utc(rows[0]["last_success_at"])
+
+def set_high_water(entity: str, scope_key: str, value: Optional[datetime]) -> None:
+    """Moves the mark forward only (GREATEST), never back."""
+    if value is None:
+        return
+    execute(
+        """
+        INSERT INTO sync_checkpoints (entity, scope_key, last_success_at)
+        VALUES (%(entity)s, %(scope_key)s, %(value)s)
+        ON DUPLICATE KEY UPDATE
+            last_success_at = GREATEST(COALESCE(last_success_at, VALUES(last_success_at)), VALUES(last_success_at))
+        """,
+        {"entity": _hwm_entity(entity), "scope_key": scope_key, "value": to_mysql_naive_utc(value)},
+    )
+
+
+def get_last_success_map(entity_prefix: str) -> dict:
+    """{(entity, scope_key): last_success_at} for every entity starting with entity_prefix."""
+    rows = query_dict(
+        """
+        SELECT entity, scope_key, last_success_at
+        FROM sync_checkpoints
+        WHERE entity LIKE %(prefix)s
+        """,
+        {"prefix": entity_prefix + "%"},
+    )
+    return {
+        (r["entity"], r["scope_key"]): to_utc(r["last_success_at"])
+        for r in rows
+        if r["last_success_at"]
+    }
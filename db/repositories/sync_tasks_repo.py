@@ -0,0 +1,218 @@
+# db/repositories/sync_tasks_repo.py
+"""
+sync_tasks: one row per (job, step, account), leased by workers on any host.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8), so concurrent
+workers never block on or double-claim the same row. A RUNNING task whose
+lease expired (worker died) is claimable again; attempts are counted per
+task and a task that keeps failing ends FAILED without touching the others.
+"""
+import json
+from typing import Dict, Iterable, Optional
+
+from db.db import ensure_table, execute, get_connection, query_dict
+
+SYNC_TASKS_DDL = """
+CREATE TABLE IF NOT EXISTS sync_tasks (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    job_id BIGINT NOT NULL,
+    step VARCHAR(32) NOT NULL,
+    ad_account_id BIGINT NOT NULL,
+    portfolio_code VARCHAR(32) NULL,
+    status ENUM('PENDING','RUNNING','SUCCESS','FAILED') NOT NULL DEFAULT 'PENDING',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    available_at DATETIME NOT NULL,
+    lease_owner VARCHAR(128) NULL,
+    lease_expires_at DATETIME NULL,
+    last_error TEXT NULL,
+    result TEXT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY uq_sync_tasks (job_id, step, ad_account_id),
+    KEY idx_sync_tasks_claim (status, available_at),
+    KEY idx_sync_tasks_lease (status, lease_expires_at)
+)
+"""
+
+CHUNK_SIZE = 50
+
+
+def ensure_sync_tasks_table() -> None:
+    ensure_table("sync_tasks", SYNC_TASKS_DDL)
+
+
+def enqueue_tasks(job_id: int, step: str, accounts: Iterable[dict], max_attempts: int = 3) -> int:
+    """accounts: rows with ad_account_id, portfolio_code. Re-enqueue is a no-op."""
+    ensure_sync_tasks_table()
+    rows = [
+        (job_id, step, int(a["ad_account_id"]), a.get("portfolio_code"), max_attempts)
+        for a in accounts
+    ]
+    sql = """
+    INSERT IGNORE INTO sync_tasks
+        (job_id, step, ad_account_id, portfolio_code, max_attempts, available_at, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s, NOW(), NOW(), NOW())
+    """
+    conn = get_connection()
+    cursor = conn.cursor(buffered=True)
+    try:
+        for i in range(0, len(rows), CHUNK_SIZE):
+            cursor.executemany(sql, rows[i:i + CHUNK_SIZE])
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return len(rows)
+
+
+def claim_task(owner: str, lease_seconds: int, job_id: Optional[int] = None,
+               step: Optional[str] = None) -> Optional[dict]:
+    """Lease the oldest runnable task (optionally of one job/step) or return None."""
+    ensure_sync_tasks_table()
+    extra = ""
+    params = []
+    if job_id is not None:
+        extra += " AND job_id = %s"
+        params.append(job_id)
+    if step is not None:
+        extra += " AND step = %s"
+        params.append(step)
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    try:
+        conn.start_transaction()
+        cursor.execute(
+            f"""
+            SELECT id, job_id, step, ad_account_id, portfolio_code, attempts, max_attempts
+            FROM sync_tasks t
+            WHERE (
+                    (status = 'PENDING' AND available_at <= NOW())
+                 OR (status = 'RUNNING' AND lease_expires_at < NOW())
+                  )
+              AND attempts < max_attempts
+              -- only tasks of live jobs (not STOPPED / FAILED / superseded);
+              -- the subquery is a plain read, so job rows aren't locked
+              AND EXISTS (
+                    SELECT 1 FROM pipeline_jobs j
+                    WHERE j.id = t.job_id
+                      AND j.status IN ('PENDING','RUNNING')
+                  )
+              {extra}
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+            """,
+            tuple(params),
+        )
+        task = cursor.fetchone()
+        if not task:
+            conn.commit()
+            return None
+
+        cursor.execute(
+            """
+            UPDATE sync_tasks
+            SET status = 'RUNNING',
+                lease_owner = %s,
+                lease_expires_at = NOW() + INTERVAL %s SECOND,
+                attempts = attempts + 1,
+                updated_at = NOW()
+            WHERE id = %s
+            """,
+            (owner, lease_seconds, task["id"]),
+        )
+        conn.commit()
+        task["attempts"] += 1
+        return task
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def heartbeat_task(task_id: int, owner: str, lease_seconds: int) -> bool:
+    """Extend the lease; False means the lease was lost to another worker."""
+    return execute(
+        """
+        UPDATE sync_tasks
+        SET lease_expires_at = NOW() + INTERVAL %s SECOND, updated_at = NOW()
+        WHERE id = %s AND lease_owner = %s AND status = 'RUNNING'
+        """,
+        (lease_seconds, task_id, owner),
+    ) > 0
+
+
+def complete_task(task_id: int, owner: str, result: dict) -> bool:
+    return execute(
+        """
+        UPDATE sync_tasks
+        SET status = 'SUCCESS', result = %s, last_error = NULL,
+            lease_owner = NULL, lease_expires_at = NULL, updated_at = NOW()
+        WHERE id = %s AND lease_owner = %s
+        """,
+        (json.dumps(result, default=str)[:60000], task_id, owner),
+    ) > 0
+
+
+def fail_task(task_id: int, owner: str, error: str, retry_delay_seconds: int) -> bool:
+    """Back to PENDING after retry_delay_seconds, or FAILED once attempts run out."""
+    return execute(
+        """
+        UPDATE sync_tasks
+        SET status = IF(attempts < max_attempts, 'PENDING', 'FAILED'),
+            available_at = NOW() + INTERVAL %s SECOND,
+            last_error = %s,
+            lease_owner = NULL, lease_expires_at = NULL, updated_at = NOW()
+        WHERE id = %s AND lease_owner = %s
+        """,
+        (retry_delay_seconds, (error or "")[:1000], task_id, owner),
+    ) > 0
+
+
+def expire_exhausted_tasks() -> int:
+    """RUNNING tasks whose worker died on the last attempt -> FAILED."""
+    ensure_sync_tasks_table()
+    return execute(
+        """
+        UPDATE sync_tasks
+        SET status = 'FAILED',
+            last_error = COALESCE(last_error, 'lease expired'),
+            lease_owner = NULL, lease_expires_at = NULL, updated_at = NOW()
+        WHERE status = 'RUNNING'
+          AND lease_expires_at < NOW()
+          AND attempts >= max_attempts
+        """
+    )
+
+
+def task_counts(job_id: int, step: str) -> Dict[str, int]:
+    rows = query_dict(
+        """
+        SELECT status, COUNT(*) AS n
+        FROM sync_tasks
+        WHERE job_id = %s AND step = %s
+        GROUP BY status
+        """,
+        (job_id, step),
+    )
+    return {r["status"]: int(r["n"]) for r in rows}
+
+
+def reset_failed_tasks(job_id: int, step: str) -> int:
+    """Job retried: FAILED tasks of (job, step) get a fresh set of attempts."""
+    return execute(
+        """
+        UPDATE sync_tasks
+        SET status = 'PENDING', attempts = 0, available_at = NOW(), updated_at = NOW()
+        WHERE job_id = %s AND step = %s AND status = 'FAILED'
+        """,
+        (job_id, step),
+    )
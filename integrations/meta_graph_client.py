@@ -2,6 +2,7 @@
 import code
 from email import message
 import time
+import threading
 from typing import Any, Dict, Generator, Optional
 import requests
 
@@ -26,6 +27,23 @@ class MetaInvalidFieldError(Exception):
     """Raised when code=100 and the message contains 'nonexisting field'"""
     pass
 
+class MetaPayloadTooLargeError(Exception):
+    """Raised when Meta asks to 'reduce the amount of data' (code=1)"""
+    pass
+
+# One keep-alive Session per thread (Session isn't thread-safe); in a
+# long-running process the TLS connections to graph.facebook.com stay warm.
+_SESSIONS = threading.local()
+
+
+def _session() -> requests.Session:
+    s = getattr(_SESSIONS, "session", None)
+    if s is None:
+        s = requests.Session()
+        _SESSIONS.session = s
+    return s
+
+
 class MetaGraphClient:
     def __init__(
         self,
@@ -33,6 +51,7 @@ class MetaGraphClient:
         timeout: int = 30,
         max_retries: int = 3,
         retry_delay: int = 5,
+        cancel_token=None,
     ):
         # Dynamically fetch from DB if not provided
         self.access_token = access_token or get_config("META_USER_TOKEN")
@@ -45,6 +64,12 @@ class MetaGraphClient:
         self.max_retries = max_retries
         self.retry_delay = retry_delay
 
+        # HTTP requests made by this client (used for sync cost history)
+        self.calls = 0
+
+        # services.cancellation.CancelToken; checked before every page
+        self.cancel_token = cancel_token
+
     # -------------------------
     # internal helpers
     # -------------------------
@@ -79,7 +104,8 @@ class MetaGraphClient:
         attempt = 0
         while attempt < self.max_retries:
             try:
-                r = requests.get(url, params=params, timeout=self.timeout)
+                self.calls += 1
+                r = _session().get(url, params=params, timeout=self.timeout)
                 data = self._safe_json(r, url)
 
                 if r.status_code != 200:
@@ -90,7 +116,7 @@ class MetaGraphClient:
             except MetaRateLimitError:
                 self._sleep_backoff(attempt, url)
                 attempt += 1
-            except (MetaInvalidFieldError, MetaObjectAccessError, MetaPermissionError):
+            except (MetaInvalidFieldError, MetaObjectAccessError, MetaPermissionError, MetaPayloadTooLargeError):
                 # CRITICAL: Do NOT retry if the field is missing or permission is denied
                 raise    
             except requests.exceptions.Timeout:
@@ -106,7 +132,9 @@ class MetaGraphClient:
                     raise
                 time.sleep(self.retry_delay)
 
-        return {}
+        # Still rate limited after every retry: an empty dict here would look
+        # like a last page and silently truncate a traversal
+        raise MetaRateLimitError(f"Meta API retries exhausted url={url}")
 
     def get_object(self, object_id_or_endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         return self.get(object_id_or_endpoint, params=params)
@@ -119,6 +147,9 @@ class MetaGraphClient:
             next_params["access_token"] = self.access_token
 
         while next_url:
+            if self.cancel_token is not None:
+                # Stop at a page boundary; callers flush what they already have
+                self.cancel_token.check()
             attempt = 0
             success = False
             while attempt < self.max_retries:
@@ -137,13 +168,19 @@ class MetaGraphClient:
                 except MetaRateLimitError:
                     self._sleep_backoff(attempt, next_url)
                     attempt += 1
+                except MetaPayloadTooLargeError:
+                    # Same request will fail again; caller must ask for less
+                    raise
                 except Exception as e:
                     attempt += 1
                     if attempt >= self.max_retries:
                         raise
                     time.sleep(self.retry_delay)
             
-            if not success or not next_url:
+            if not success:
+                # Never end a traversal early as if it were complete
+                raise MetaRateLimitError(f"Meta API paging retries exhausted url={next_url}")
+            if not next_url:
                 break
 
     def _handle_meta_error(self, err: dict) -> None:
@@ -154,6 +191,8 @@ class MetaGraphClient:
 
         if code == 100 and "nonexisting field" in message:
             raise MetaInvalidFieldError(message)
+        if code == 1 and "reduce the amount of data" in message.lower():
+            raise MetaPayloadTooLargeError(message)
         if code == 100 and subcode == 33:
             raise MetaObjectAccessError(message)
         if code == 200:
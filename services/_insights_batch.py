@@ -0,0 +1,188 @@
+# services/_insights_batch.py
+"""
+Page-at-a-time insights transformer.
+
+Turns a page of raw Graph insight rows into columnar lists that the bulk
+writers in services/insights_service.py consume directly:
+
+  - dates are ISO 'YYYY-MM-DD' strings (validated once)
+  - impressions / reach / results are plain ints
+  - spend / frequency / cost_per_result are fixed-point ints scaled by
+    FP_SCALE (the writer divides in SQL, no Decimal per row)
+
+Result selection matches _pick_results_and_cpr in insights_service.py.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from typing import Any, Dict, List, Optional
+
+FP_DIGITS = 4
+FP_SCALE = 10 ** FP_DIGITS
+
+# Same order as _pick_results_and_cpr; built once instead of per row.
+PREFERRED_ACTIONS = (
+    "onsite_conversion.messaging_conversation_started_7d",
+    "messaging_conversation_started_7d",
+    "lead",
+    "purchase",
+    "omni_purchase",
+    "link_click",
+    "landing_page_view",
+)
+
+ID_FIELD = {
+    "campaign": "campaign_id",
+    "adset": "adset_id",
+    "ad": "ad_id",
+    "account": "account_id",
+}
+
+COLUMNS = (
+    "ids", "dates", "impressions", "reach",
+    "spend_fp", "frequency_fp", "results", "cpr_fp",
+)
+
+
+def _fast_int(x: Any, default: int = 0) -> int:
+    if x is None or x == "":
+        return default
+    try:
+        return int(x)
+    except (TypeError, ValueError):
+        try:
+            return int(float(x))
+        except Exception:
+            return default
+
+
+def _to_fixed(x: Any) -> Optional[int]:
+    """'12.34' -> 123400 (FP_SCALE units). None on empty/invalid."""
+    if x is None or x == "":
+        return None
+    s = str(x)
+    whole, _, frac = s.partition(".")
+    digits = whole[1:] if whole.startswith("-") else whole
+    # Fast path: plain "123.45" strings (what Graph returns)
+    if (digits.isdigit() or (not digits and frac)) and (not frac or frac.isdigit()) and len(frac) <= FP_DIGITS:
+        value = int(digits or "0") * FP_SCALE + int(frac.ljust(FP_DIGITS, "0"))
+        return -value if whole.startswith("-") else value
+    try:
+        return int((Decimal(s) * FP_SCALE).to_integral_value(rounding=ROUND_HALF_EVEN))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _valid_date(s: Any) -> Optional[str]:
+    if not s:
+        return None
+    try:
+        date.fromisoformat(s)
+        return s
+    except (TypeError, ValueError):
+        return None
+
+
+def _pick_results(row: dict) -> int:
+    results = _fast_int(row.get("results"))
+    if results > 0:
+        return results
+
+    actions = row.get("actions") or []
+    if not actions:
+        return results
+
+    action_map = {}
+    for a in actions:
+        if isinstance(a, dict) and a.get("action_type"):
+            action_map[a["action_type"]] = a.get("value")
+
+    for at in PREFERRED_ACTIONS:
+        v = _fast_int(action_map.get(at))
+        if v > 0:
+            return v
+
+    if action_map:
+        return sum(_fast_int(v) for v in action_map.values())
+    return results
+
+
+def _cpr_fixed(spend_fp: Optional[int], results: int) -> Optional[int]:
+    """spend / results rounded half-even to 0.01, in FP_SCALE units."""
+    if results <= 0:
+        return None
+    cent = FP_SCALE // 100
+    q, r = divmod(spend_fp or 0, results * cent)
+    twice = 2 * r
+    if twice > results * cent or (twice == results * cent and q % 2):
+        q += 1
+    return q * cent
+
+
+HOURLY_BREAKDOWN = "hourly_stats_aggregated_by_advertiser_time_zone"
+
+
+def _hour_of(row: dict) -> Optional[int]:
+    """'13:00:00 - 13:59:59' -> 13"""
+    v = row.get(HOURLY_BREAKDOWN)
+    if not v:
+        return None
+    try:
+        h = int(str(v)[:2])
+    except ValueError:
+        return None
+    return h if 0 <= h <= 23 else None
+
+
+def transform_insights_page(rows: List[dict], level: str, hourly: bool = False) -> Dict[str, Any]:
+    """
+    Transform one page of insight rows for `level` into columns.
+    Rows without a date or object id are counted in "skipped".
+    hourly=True adds an "hours" column from the hourly breakdown.
+    """
+    id_field = ID_FIELD[level]
+    cols: Dict[str, Any] = {c: [] for c in COLUMNS}
+    skipped = 0
+    hours: List[int] = []
+    if hourly:
+        cols["hours"] = hours
+
+    ids = cols["ids"]
+    dates = cols["dates"]
+    impressions = cols["impressions"]
+    reach = cols["reach"]
+    spend_fp = cols["spend_fp"]
+    frequency_fp = cols["frequency_fp"]
+    results_col = cols["results"]
+    cpr_fp = cols["cpr_fp"]
+
+    for row in rows:
+        row = row or {}
+        d = _valid_date(row.get("date_start"))
+        obj_id = _fast_int(row.get(id_field), default=0)
+        if not d or not obj_id:
+            skipped += 1
+            continue
+        if hourly:
+            h = _hour_of(row)
+            if h is None:
+                skipped += 1
+                continue
+            hours.append(h)
+
+        spend = _to_fixed(row.get("spend"))
+        results = _pick_results(row)
+        cpr = _to_fixed(row.get("cost_per_result"))
+        if cpr is None:
+            cpr = _cpr_fixed(spend, results)
+
+        ids.append(obj_id)
+        dates.append(d)
+        impressions.append(_fast_int(row.get("impressions")))
+        reach.append(_fast_int(row.get("reach")))
+        spend_fp.append(spend)
+        frequency_fp.append(_to_fixed(row.get("frequency")))
+        results_col.append(results)
+        cpr_fp.append(cpr)
+
+    cols["skipped"] = skipped
+    return cols
@@ -0,0 +1,45 @@
+# services/_stream_writer.py
+"""
+Bounded-memory writer for paged entity syncs.
+
+Records are buffered while paging continues and flushed as sorted
+micro-batches once the buffer reaches `max_rows` (ENTITIES_STREAM_MAX_ROWS).
+Whatever was flushed stays written if a later page fails; leaving the
+`with` block (normally or on error) flushes the rest.
+"""
+import os
+from typing import Callable, List
+
+STREAM_MAX_ROWS = int(os.getenv("ENTITIES_STREAM_MAX_ROWS", "500"))
+
+
+class StreamingUpserter:
+    def __init__(self, write_fn: Callable[[List[dict]], None], key: str, max_rows: int = STREAM_MAX_ROWS):
+        self.write_fn = write_fn
+        self.key = key
+        self.max_rows = max(1, max_rows)
+        self.buffer: List[dict] = []
+        self.saved = 0
+
+    def add(self, record: dict) -> None:
+        self.buffer.append(record)
+        if len(self.buffer) >= self.max_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        batch = self.buffer
+        self.buffer = []
+        # sorted per micro-batch -> same lock order as the old whole-list sort
+        batch.sort(key=lambda x: x[self.key])
+        self.write_fn(batch)
+        self.saved += len(batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Rows already fetched are valid even if a later page failed
+        self.flush()
+        return False
@@ -0,0 +1,124 @@
+# services/activity_service.py
+"""
+Per-account activity score -> refresh cadence and lookback depth.
+
+score = status_factor(billing.account_status) * log10(1 + spend_7d) / max over accounts
+  in [0, 1]; spend_7d comes from ad_daily_insights.
+
+tiers:
+  hot      score >= ACTIVITY_HOT_SCORE   normal cadence, full lookback
+  warm     0 < score < hot               cadence x ACTIVITY_WARM_MULT, short lookback
+  dormant  score == 0                    cadence x ACTIVITY_DORMANT_MULT, probe lookback
+
+Accounts with no ad_daily_insights history at all (new accounts, fresh DB)
+get no score and are treated as hot, so their first backfill is full depth.
+"""
+import math
+import os
+import time
+from threading import Lock
+from typing import Dict
+
+from logs.logger import logger
+from db.db import query_dict
+
+HOT_SCORE = float(os.getenv("ACTIVITY_HOT_SCORE", "0.5"))
+WARM_MULT = float(os.getenv("ACTIVITY_WARM_MULT", "4"))
+DORMANT_MULT = float(os.getenv("ACTIVITY_DORMANT_MULT", "24"))
+WARM_INSIGHTS_DAYS = int(os.getenv("ACTIVITY_WARM_INSIGHTS_DAYS", "7"))
+DORMANT_INSIGHTS_DAYS = int(os.getenv("ACTIVITY_DORMANT_INSIGHTS_DAYS", "2"))
+CACHE_SECONDS = int(os.getenv("ACTIVITY_CACHE_SECONDS", "600"))
+
+# Meta account_status: 1 ACTIVE, 9 IN_GRACE_PERIOD -> full weight;
+# 3 UNSETTLED, 7 PENDING_RISK_REVIEW, 8 PENDING_SETTLEMENT -> half; anything else can't deliver
+STATUS_FACTOR = {1: 1.0, 9: 1.0, 3: 0.5, 7: 0.5, 8: 0.5}
+
+# billing-less accounts (never synced) are treated as active
+_UNKNOWN_STATUS_FACTOR = 1.0
+
+_CACHE: Dict[int, float] = {}
+_CACHE_AT = 0.0
+_CACHE_LOCK = Lock()
+
+
+def _compute_scores() -> Dict[int, float]:
+    rows = query_dict("""
+        SELECT a.ad_account_id,
+               b.account_status,
+               COALESCE(s.spend_7d, 0) AS spend_7d,
+               EXISTS (
+                   SELECT 1
+                   FROM campaigns c
+                   JOIN ads d ON d.campaign_id = c.campaign_id
+                   JOIN ad_daily_insights i ON i.ad_id = d.ad_id
+                   WHERE c.ad_account_id = a.ad_account_id
+               ) AS has_history
+        FROM ad_accounts a
+        LEFT JOIN billing b ON b.ad_account_id = a.ad_account_id
+        LEFT JOIN (
+            SELECT c.ad_account_id, SUM(i.spend) AS spend_7d
+            FROM ad_daily_insights i
+            JOIN ads d ON d.ad_id = i.ad_id
+            JOIN campaigns c ON c.campaign_id = d.campaign_id
+            WHERE i.date >= CURDATE() - INTERVAL 7 DAY
+            GROUP BY c.ad_account_id
+        ) s ON s.ad_account_id = a.ad_account_id
+    """)
+
+    raw = {}
+    for r in rows:
+        if not r["has_history"]:
+            # nothing to judge activity by yet -> no score -> hot
+            continue
+        status = r["account_status"]
+        factor = _UNKNOWN_STATUS_FACTOR if status is None else STATUS_FACTOR.get(int(status), 0.0)
+        raw[int(r["ad_account_id"])] = factor * math.log10(1 + float(r["spend_7d"] or 0))
+
+    top = max(raw.values(), default=0.0)
+    if top <= 0:
+        return {k: 0.0 for k in raw}
+    return {k: v / top for k, v in raw.items()}
+
+
+def activity_scores() -> Dict[int, float]:
+    """{ad_account_id: score}, recomputed at most every ACTIVITY_CACHE_SECONDS."""
+    global _CACHE, _CACHE_AT
+    with _CACHE_LOCK:
+        if _CACHE and time.time() - _CACHE_AT < CACHE_SECONDS:
+            return _CACHE
+        try:
+            _CACHE = _compute_scores()
+            _CACHE_AT = time.time()
+            tiers = {}
+            for score in _CACHE.values():
+                t = _tier(score)
+                tiers[t] = tiers.get(t, 0) + 1
+            logger.info(f"📈 activity scores refreshed: {tiers}")
+        except Exception as e:
+            logger.warning(f"⚠️ activity scores unavailable, treating all accounts as hot: {e}")
+        return _CACHE
+
+
+def _tier(score: float) -> str:
+    if score >= HOT_SCORE:
+        return "hot"
+    return "warm" if score > 0 else "dormant"
+
+
+def account_tier(ad_account_id: int) -> str:
+    score = activity_scores().get(int(ad_account_id))
+    # Unknown (new) accounts get the full treatment
+    return "hot" if score is None else _tier(score)
+
+
+def cadence_multiplier(ad_account_id: int) -> float:
+    return {"hot": 1.0, "warm": WARM_MULT, "dormant": DORMANT_MULT}[account_tier(ad_account_id)]
+
+
+def insights_days(ad_account_id: int, default_days: int) -> int:
+    tier = account_tier(ad_account_id)
+    if tier == "warm":
+        return min(default_days, WARM_INSIGHTS_DAYS)
+    if tier == "dormant":
+        return min(default_days, DORMANT_INSIGHTS_DAYS)
+    return default_days
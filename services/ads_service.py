@@ -4,13 +4,15 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
 import json
+import os
 from typing import Any, Dict, Optional
 from xmlrpc import client
 
 from logs.logger import logger
 from integrations.meta_graph_client import MetaObjectAccessError
 from db.db import query_dict, execute
-from utils.datetime_utils import parse_meta_datetime
+from utils.datetime_utils import parse_meta_datetime, max_meta_datetime
+from services._stream_writer import StreamingUpserter
 
 
 # =========================
@@ -221,9 +223,27 @@ def upsert_ads_batch(records: list[dict]) -> None:
         cursor.close()
         conn.close()
 
-def sync_ads_for_account(client, ad_account_id, mode="full", days=30):
+def _ad_record(ad: dict) -> dict:
+    """Graph ad (ADS_FIELDS) -> ads row (upsert_ads_batch)."""
+    creative = ad.get("creative") or {}
+    return {
+        "ad_id": int(ad.get("id")),
+        "adset_id": int(ad.get("adset_id")),
+        "campaign_id": int(ad.get("campaign_id")),
+        "name": ad.get("name"),
+        "status": ad.get("status"),
+        "effective_status": ad.get("effective_status"),
+        "thumbnail_url": creative.get("thumbnail_url"),
+        "image_url": creative.get("image_url"),
+        "post_id": creative.get("object_story_id"),
+        "post_link": ad.get("post_link")
+    }
+
+def sync_ads_for_account(client, ad_account_id, mode="full", days=30, updated_since=None):
     act = f"act_{ad_account_id}"
     cutoff_str = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+    if updated_since is not None:
+        cutoff_str = int(updated_since.timestamp())
 
     filters = []
     if mode == "incremental":
@@ -231,35 +251,158 @@ def sync_ads_for_account(client, ad_account_id, mode="full", days=30):
  
     params = {"fields": ADS_FIELDS, "limit": 100, "filtering": json.dumps(filters)}
 
-    all_records = []
+    max_updated = None
+    touched_adsets, touched_campaigns = set(), set()
     try:
-        for raw_ad in client.get_paged(f"{act}/ads", params=params):
-            ad = _normalize_keys(raw_ad)
-            creative = ad.get("creative") or {}
-            all_records.append({
-                "ad_id": int(ad.get("id")),
-                "adset_id": int(ad.get("adset_id")),
-                "campaign_id": int(ad.get("campaign_id")),
-                "name": ad.get("name"),
-                "status": ad.get("status"),
-                "effective_status": ad.get("effective_status"),
-                "thumbnail_url": creative.get("thumbnail_url"),
-                "image_url": creative.get("image_url"),
-                "post_id": creative.get("object_story_id"),
-                "post_link": ad.get("post_link")
-            })
-        
-        if all_records:
-            all_records.sort(key=lambda x: x["ad_id"])
-            upsert_ads_batch(all_records)
-            
-        return {"level": "Ads", "account": act, "saved": len(all_records), "ok": True}
+        with StreamingUpserter(upsert_ads_batch, "ad_id") as writer:
+            for raw_ad in client.get_paged(f"{act}/ads", params=params):
+                record = _ad_record(_normalize_keys(raw_ad))
+                writer.add(record)
+                touched_adsets.add(record["adset_id"])
+                touched_campaigns.add(record["campaign_id"])
+                max_updated = max_meta_datetime(max_updated, raw_ad.get("updated_time"))
+
+        return {
+            "level": "Ads", "account": act, "saved": writer.saved, "ok": True,
+            "complete": True, "max_updated_time": max_updated,
+            "touched_adsets": touched_adsets, "touched_campaigns": touched_campaigns,
+        }
     # except Exception as e:
     #     logger.error(f"❌ Ads sync failed for {act}: {e}")
     #     return {"level": "Ads", "account": act, "saved": len(all_records), "ok": False, "error": str(e)}  
     except Exception as e:
         logger.exception(f"❌ ads sync failed for {act}")
         raise  
+# =========================
+# Single pass: ads + creatives
+# =========================
+
+# Union of ADS_FIELDS and creatives_service.ADS_WITH_CREATIVE_FIELDS
+ADS_WITH_CREATIVE_UNION_FIELDS = (
+    "id,name,status,effective_status,adset_id,campaign_id,updated_time,"
+    "creative{"
+    "id,name,body,effective_object_story_id,object_story_id,instagram_permalink_url,"
+    "link_url,thumbnail_url,image_url,video_id,object_story_spec"
+    "}"
+)
+
+# When on, the entities step also writes creatives and the creatives step is skipped
+SINGLE_PASS_CREATIVES = os.getenv("ADS_SINGLE_PASS", "1") == "1"
+
+
+def upsert_ads_with_creative_batch(records: list[dict]) -> None:
+    """
+    Same as upsert_ads_batch plus creative_id, so the ad -> creative link
+    is written in the ads upsert itself (no UPDATE ads per row).
+    """
+    if not records:
+        return
+
+    sql = """
+    INSERT INTO ads (
+        ad_id, adset_id, campaign_id, name, status,
+        effective_status, thumbnail_url, image_url,
+        post_id, post_link, creative_id, updated_at
+    ) VALUES (
+        %(ad_id)s, %(adset_id)s, %(campaign_id)s, %(name)s, %(status)s,
+        %(effective_status)s, %(thumbnail_url)s, %(image_url)s,
+        %(post_id)s, %(post_link)s, %(creative_id)s, NOW()
+    )
+    ON DUPLICATE KEY UPDATE
+        adset_id=VALUES(adset_id),
+        campaign_id=VALUES(campaign_id),
+        name=VALUES(name),
+        status=VALUES(status),
+        effective_status=VALUES(effective_status),
+        thumbnail_url=COALESCE(VALUES(thumbnail_url), thumbnail_url),
+        image_url=VALUES(image_url),
+        post_id=COALESCE(VALUES(post_id), post_id),
+        post_link=COALESCE(VALUES(post_link), post_link),
+        creative_id=COALESCE(VALUES(creative_id), creative_id),
+        updated_at=NOW();
+    """
+    from db.db import get_connection
+    conn = get_connection()
+    cursor = conn.cursor(buffered=True)
+    try:
+        CHUNK_SIZE = 50
+
+        for i in range(0, len(records), CHUNK_SIZE):
+            chunk = records[i:i + CHUNK_SIZE]
+            cursor.executemany(sql, chunk)
+            conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _ad_with_creative_record(ad: dict) -> dict:
+    """Graph ad (ADS_WITH_CREATIVE_UNION_FIELDS) -> ads row incl. creative_id."""
+    creative = ad.get("creative") or {}
+    record = _ad_record(ad)
+    record.update({
+        # same precedence the creatives step used to apply afterwards
+        "post_id": creative.get("effective_object_story_id") or creative.get("object_story_id"),
+        "post_link": creative.get("instagram_permalink_url") or creative.get("link_url"),
+        "creative_id": _safe_int(creative.get("id")),
+    })
+    return record
+
+
+def sync_ads_with_creatives_for_account(client, ad_account_id, mode="full", days=30, updated_since=None):
+    """
+    One traversal of act_X/ads for the entities AND creatives steps:
+    creatives are upserted first (deduplicated), then ads with creative_id.
+    updated_since (aware datetime) replaces the `days` cutoff in incremental mode.
+    """
+    from services.creatives_service import upsert_creatives_batch, _creative_record
+
+    act = f"act_{ad_account_id}"
+    cutoff_str = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+
+    if updated_since is not None:
+        cutoff_str = int(updated_since.timestamp())
+
+    filters = []
+    if mode == "incremental":
+        filters.append({"field": "updated_time", "operator": "GREATER_THAN", "value": cutoff_str})
+
+    params = {"fields": ADS_WITH_CREATIVE_UNION_FIELDS, "limit": 100, "filtering": json.dumps(filters)}
+
+    creatives = []
+    saved_creatives = 0
+    max_updated = None
+    touched_adsets, touched_campaigns = set(), set()
+
+    def _write(batch):
+        # creatives of this micro-batch first, then the ads pointing at them
+        nonlocal saved_creatives
+        saved_creatives += upsert_creatives_batch(creatives)
+        creatives.clear()
+        upsert_ads_with_creative_batch(batch)
+
+    try:
+        with StreamingUpserter(_write, "ad_id") as writer:
+            for raw_ad in client.get_paged(f"{act}/ads", params=params):
+                ad = _normalize_keys(raw_ad)
+                max_updated = max_meta_datetime(max_updated, ad.get("updated_time"))
+                record = _ad_with_creative_record(ad)
+                if record["creative_id"]:
+                    creatives.append(_creative_record(ad["creative"]))
+                writer.add(record)
+                touched_adsets.add(record["adset_id"])
+                touched_campaigns.add(record["campaign_id"])
+
+        return {
+            "level": "Ads", "account": act, "saved": writer.saved, "complete": True,
+            "creatives": saved_creatives, "ok": True, "max_updated_time": max_updated,
+            "touched_adsets": touched_adsets, "touched_campaigns": touched_campaigns,
+        }
+    except Exception:
+        logger.exception(f"❌ ads+creatives sync failed for {act}")
+        raise
+
+
 def sync_ads(user_token: str, mode: str = "full", days: int = 30) -> Dict[str, int]:
     """
     Legacy wrapper: NOT threaded. Prefer sync_ads_for_account(client, ...)
@@ -8,20 +8,40 @@ import json # Use standard json for the filters
 
 from logs.logger import logger
 from db.db import query_dict
-from db.repositories.adsets_repo import upsert_adset
+from db.repositories.adsets_repo import upsert_adset, upsert_adsets_batch
 from services.ads_service import _normalize_keys
 from services.campaigns_service import _parse_dt
+from utils.datetime_utils import max_meta_datetime
+from services._stream_writer import StreamingUpserter
 
 # ✅ Configuration
 ADSET_FIELDS = "id,name,status,effective_status,daily_budget,start_time,updated_time,campaign_id"
 
-def sync_adsets_for_account(client, ad_account_id, mode="full", days=30, **kwargs):
+def _adset_record(adset: dict, ad_account_id: int) -> dict:
+    """Graph adset -> adsets row (upsert_adsets_batch)."""
+    return {
+        "adset_id": int(adset["id"]),
+        "campaign_id": int(adset["campaign_id"]),
+        "ad_account_id": ad_account_id,
+        "name": adset.get("name"),
+        "status": adset.get("status"),
+        "effective_status": adset.get("effective_status"),
+        "daily_budget": adset.get("daily_budget"),
+        "start_time": _parse_dt(adset.get("start_time")),
+        "billing_event": adset.get("billing_event"),
+        "optimization_goal": adset.get("optimization_goal")
+    }
+
+def sync_adsets_for_account(client, ad_account_id, mode="full", days=30, updated_since=None, **kwargs):
     """
     kwargs allows passing 'portfolio_code' without crashing if it's sent 
     from the main loop but not used here.
+    updated_since (aware datetime) replaces the `days` cutoff in incremental mode.
     """
     act = f"act_{ad_account_id}"
     cutoff_str = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+    if updated_since is not None:
+        cutoff_str = int(updated_since.timestamp())
 
     # filters = [{"field": "effective_status", "operator": "IN", "value": ["ACTIVE"]}]
     filters = []
@@ -35,31 +55,22 @@ def sync_adsets_for_account(client, ad_account_id, mode="full", days=30, **kwarg
         "filtering": json.dumps(filters)
     }
 
-    saved = 0
-    all_records = []
+    max_updated = None
+    touched_adsets, touched_campaigns = set(), set()
     try:
-        for raw_adset in client.get_paged(f"{act}/adsets", params=params):
-            adset = _normalize_keys(raw_adset)
-            all_records.append({
-                "adset_id": int(adset["id"]),
-                "campaign_id": int(adset["campaign_id"]),
-                "ad_account_id": ad_account_id,
-                "name": adset.get("name"),
-                "status": adset.get("status"),
-                "effective_status": adset.get("effective_status"),
-                "daily_budget": adset.get("daily_budget"),
-                "start_time": _parse_dt(adset.get("start_time")),
-                "billing_event": adset.get("billing_event"),
-                "optimization_goal": adset.get("optimization_goal")
-            })
-        
-        if all_records:
-            # You'll need to create this batch function in your repo
-            from db.repositories.adsets_repo import upsert_adsets_batch
-            all_records.sort(key=lambda x: x["adset_id"]) 
-            upsert_adsets_batch(all_records)
-            
-        return {"level": "Adsets", "account": act, "saved": len(all_records), "ok": True}
+        with StreamingUpserter(upsert_adsets_batch, "adset_id") as writer:
+            for raw_adset in client.get_paged(f"{act}/adsets", params=params):
+                record = _adset_record(_normalize_keys(raw_adset), ad_account_id)
+                writer.add(record)
+                touched_adsets.add(record["adset_id"])
+                touched_campaigns.add(record["campaign_id"])
+                max_updated = max_meta_datetime(max_updated, raw_adset.get("updated_time"))
+
+        return {
+            "level": "Adsets", "account": act, "saved": writer.saved, "ok": True,
+            "complete": True, "max_updated_time": max_updated,
+            "touched_adsets": touched_adsets, "touched_campaigns": touched_campaigns,
+        }
     except Exception as e:
         logger.exception(f"❌ Adset sync failed for {act}")
         raise
@@ -0,0 +1,149 @@
+# services/bookkeeping_writer.py
+"""
+Background writer for job bookkeeping (heartbeats + pipeline_job_logs).
+
+Sync threads only append to in-memory buffers and return; one daemon
+thread flushes every BOOKKEEPING_TICK_SECONDS:
+  - heartbeats coalesced into one UPDATE pipeline_jobs ... WHERE id IN (...)
+  - log rows as multi-row INSERTs (chunks of 50), in arrival order
+
+The log buffer is bounded (BOOKKEEPING_MAX_ROWS); when full the oldest
+rows are dropped and counted rather than blocking a sync thread.
+A chunk the DB rejects (bad data, not a lost connection) is retried row
+by row and the rejected rows are dropped, so one poison row can't stall
+the queue; connection/pool errors requeue the unwritten work.
+flush() drains synchronously (end of a job, process exit).
+"""
+import atexit
+import os
+import threading
+from collections import deque
+from typing import Optional
+
+from mysql.connector import errors
+
+from logs.logger import logger
+from db.db import execute, execute_many
+
+TICK_SECONDS = float(os.getenv("BOOKKEEPING_TICK_SECONDS", "2"))
+MAX_ROWS = int(os.getenv("BOOKKEEPING_MAX_ROWS", "5000"))
+CHUNK_SIZE = 50
+
+LOG_INSERT = """
+    INSERT INTO pipeline_job_logs (job_id, step_name, status, message)
+    VALUES (%s, %s, %s, %s)
+"""
+# DB unreachable / pool exhausted: worth retrying the same rows next tick
+TRANSIENT_ERRORS = (errors.InterfaceError, errors.OperationalError, errors.PoolError)
+
+
+class BookkeepingWriter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._heartbeats = set()
+        self._logs = deque()
+        self._dropped = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run, name="bookkeeping-writer", daemon=True
+                    )
+                    self._thread.start()
+
+    # -------------------------
+    # producers (never block on the DB)
+    # -------------------------
+    def heartbeat(self, job_id) -> None:
+        if not job_id:
+            return
+        with self._lock:
+            self._heartbeats.add(job_id)
+        self._ensure_thread()
+
+    def log(self, job_id, step_name: str, status: str, message: str = "") -> None:
+        with self._lock:
+            if len(self._logs) >= MAX_ROWS:
+                self._logs.popleft()
+                self._dropped += 1
+            self._logs.append((job_id, step_name, status, message))
+        self._ensure_thread()
+
+    # -------------------------
+    # consumer
+    # -------------------------
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(TICK_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ bookkeeping flush failed: {e}")
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                heartbeats = sorted(self._heartbeats)
+                self._heartbeats.clear()
+                rows = list(self._logs)
+                self._logs.clear()
+                dropped, self._dropped = self._dropped, 0
+
+            if dropped:
+                logger.warning(f"⚠️ bookkeeping buffer full, dropped {dropped} oldest log rows")
+
+            i = 0
+            try:
+                while i < len(rows):
+                    chunk = rows[i:i + CHUNK_SIZE]
+                    try:
+                        execute_many(LOG_INSERT, chunk)
+                        i += len(chunk)
+                        continue
+                    except TRANSIENT_ERRORS:
+                        raise
+                    except errors.Error as e:
+                        logger.warning(f"⚠️ bookkeeping chunk rejected ({e}), retrying row by row")
+
+                    # Row by row; i advances per row, so a transient error
+                    # here requeues only the rows not written yet
+                    end = i + len(chunk)
+                    rejected = 0
+                    while i < end:
+                        try:
+                            execute(LOG_INSERT, rows[i])
+                        except TRANSIENT_ERRORS:
+                            raise
+                        except errors.Error as e:
+                            rejected += 1
+                            logger.error(f"❌ bookkeeping row dropped (job {rows[i][0]}, {rows[i][1]}): {e}")
+                        i += 1
+                    if rejected:
+                        logger.warning(f"⚠️ bookkeeping dropped {rejected} rejected log rows")
+
+                if heartbeats:
+                    in_list = ",".join(["%s"] * len(heartbeats))
+                    execute(
+                        f"UPDATE pipeline_jobs SET updated_at = NOW() WHERE id IN ({in_list})",
+                        tuple(heartbeats),
+                    )
+                    heartbeats = []
+            except Exception:
+                # Put unwritten work back in front (still bounded) for the next tick
+                with self._lock:
+                    self._heartbeats.update(heartbeats)
+                    self._logs.extendleft(reversed(rows[i:]))
+                    while len(self._logs) > MAX_ROWS:
+                        self._logs.popleft()
+                        self._dropped += 1
+                raise
+
+
+WRITER = BookkeepingWriter()
+atexit.register(WRITER.flush)
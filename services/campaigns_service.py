@@ -10,6 +10,8 @@ from typing import Dict, Any, Optional
 from logs.logger import logger
 from integrations.meta_graph_client import MetaGraphClient, MetaRateLimitError
 from db.db import execute
+from utils.datetime_utils import max_meta_datetime
+from services._stream_writer import StreamingUpserter
 from services.insights_service import _to_date # Reuse your date helper
 
 # =========================
@@ -22,7 +24,8 @@ CAMPAIGN_FIELDS = (
     "objective,"
     "start_time,"
     "status,"
-    "effective_status"
+    "effective_status,"
+    "updated_time"
 )
 
 def _parse_dt(dt_str: Optional[str]):
@@ -187,9 +190,24 @@ def update_real_status(campaign_id: int) -> None:
     """
     execute(sql, {"campaign_id": campaign_id})
 
-def sync_campaigns_for_account(client, ad_account_id, mode="full", days=30):
+def _campaign_record(c: dict, ad_account_id: int) -> dict:
+    """Graph campaign -> campaigns row (upsert_campaigns_batch)."""
+    return {
+        "campaign_id": int(c["id"]),
+        "name": c.get("name"),
+        "objective": c.get("objective"),
+        "start_time": _parse_dt(c.get("start_time")),
+        "ad_account_id": ad_account_id,
+        "status": c.get("status"),
+        "effective_status": c.get("effective_status"),
+    }
+
+def sync_campaigns_for_account(client, ad_account_id, mode="full", days=30, updated_since=None):
+    """updated_since (aware datetime) replaces the `days` cutoff in incremental mode."""
     act = f"act_{ad_account_id}"
     cutoff_str = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+    if updated_since is not None:
+        cutoff_str = int(updated_since.timestamp())
     
     # 1. Initialize empty filters list (Business wants all statuses)
     filters = []
@@ -210,20 +228,16 @@ def sync_campaigns_for_account(client, ad_account_id, mode="full", days=30):
         "filtering": json.dumps(filters) if filters else None
     }
 
-    saved = 0
-    all_records = []
-    for c in client.get_paged(f"{act}/campaigns", params=params):
-        all_records.append({
-            "campaign_id": int(c["id"]),
-            "name": c.get("name"),
-            "objective": c.get("objective"),
-            "start_time": _parse_dt(c.get("start_time")),
-            "ad_account_id": ad_account_id,
-            "status": c.get("status"),
-            "effective_status": c.get("effective_status"),
-        })
-    
-    if all_records:
-        all_records.sort(key=lambda x: x["campaign_id"])
-        upsert_campaigns_batch(all_records)
-    return {"level": "Campaigns", "account": act, "saved": len(all_records)}
+    max_updated = None
+    touched_campaigns = set()
+    with StreamingUpserter(upsert_campaigns_batch, "campaign_id") as writer:
+        for c in client.get_paged(f"{act}/campaigns", params=params):
+            record = _campaign_record(c, ad_account_id)
+            writer.add(record)
+            touched_campaigns.add(record["campaign_id"])
+            max_updated = max_meta_datetime(max_updated, c.get("updated_time"))
+
+    return {
+        "level": "Campaigns", "account": act, "saved": writer.saved, "complete": True,
+        "max_updated_time": max_updated, "touched_campaigns": touched_campaigns,
+    }
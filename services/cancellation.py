@@ -0,0 +1,102 @@
+# services/cancellation.py
+"""
+Cooperative cancellation for pipeline jobs.
+
+A CancelToken per job is shared by every thread working on it (workers look
+it up with token_for(job_id)). It trips when:
+  - the job row is set to STOPPED (/api/stop-job), polled at most every
+    CANCEL_POLL_SECONDS, or
+  - the job's deadline passes, or
+  - cancel() is called.
+
+MetaGraphClient.get_paged checks it before every page, so in-flight
+accounts stop at the next page boundary; the streaming writers flush what
+they already fetched on the way out.
+"""
+import os
+import time
+from threading import Event, Lock
+from typing import Dict, Optional
+
+from logs.logger import logger
+from db.db import query_scalar
+
+CANCEL_POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", "5"))
+
+
+class JobCancelledError(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self, job_id=None, deadline_seconds: float = 0):
+        self.job_id = job_id
+        self.reason: Optional[str] = None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds and deadline_seconds > 0 else None
+        self._event = Event()
+        self._poll_lock = Lock()
+        self._next_poll = 0.0
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            logger.warning(f"🛑 job {self.job_id} cancelling in-flight work: {reason}")
+
+    def _poll_stopped(self) -> None:
+        now = time.monotonic()
+        if now < self._next_poll or not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_poll = now + CANCEL_POLL_SECONDS
+            status = query_scalar("SELECT status FROM pipeline_jobs WHERE id=%s", (self.job_id,))
+            if status == "STOPPED":
+                self.cancel("stopped")
+        except Exception as e:
+            logger.warning(f"⚠️ cancel poll failed job={self.job_id}: {e}")
+        finally:
+            self._poll_lock.release()
+
+    def is_cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+            return True
+        if self.job_id:
+            self._poll_stopped()
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self.is_cancelled():
+            raise JobCancelledError(f"job {self.job_id} {self.reason}")
+
+
+# =========================
+# Registry (one token per job per process)
+# =========================
+_TOKENS: Dict[int, CancelToken] = {}
+_TOKENS_LOCK = Lock()
+
+
+def register(job_id, deadline_seconds: float = 0) -> CancelToken:
+    with _TOKENS_LOCK:
+        token = CancelToken(job_id, deadline_seconds)
+        _TOKENS[job_id] = token
+        return token
+
+
+def token_for(job_id) -> Optional[CancelToken]:
+    """Token of a job; created on first use (e.g. a task worker on another host)."""
+    if not job_id:
+        return None
+    with _TOKENS_LOCK:
+        token = _TOKENS.get(job_id)
+        if token is None:
+            token = _TOKENS[job_id] = CancelToken(job_id)
+        return token
+
+
+def release(job_id) -> None:
+    with _TOKENS_LOCK:
+        _TOKENS.pop(job_id, None)
@@ -0,0 +1,169 @@
+# services/concurrency_governor.py
+"""
+Process-wide concurrency governor shared by all sync workers.
+
+Every per-account (or per-task) unit of work takes a slot before it runs.
+A slot costs units from three budgets:
+
+  graph - concurrent Graph requests (one in flight per running account task)
+  db    - pooled MySQL connections (db.db.DB_POOL_SIZE, GOV_DB_RESERVE kept for the API)
+  cpu   - transform/serialization threads
+
+A step may use at most its fair share of each budget: capacity divided by
+the number of steps that currently have work running or waiting. When a
+step finishes (no running or waiting tasks), the others' shares grow on the
+next acquire - waiters are woken on every release.
+
+Workers still size their ThreadPoolExecutor (workers_for, same size as
+without the governor), but that is only an upper bound; the governor
+decides how many of those threads run at once.
+GOVERNOR_ENABLED=0 turns every slot into a no-op.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from db.db import DB_POOL_SIZE
+from logs.logger import logger
+
+GOVERNOR_ENABLED = os.getenv("GOVERNOR_ENABLED", "1") == "1"
+
+CAPACITY = {
+    "graph": int(os.getenv("GOV_GRAPH_SLOTS", "8")),
+    "db": max(1, DB_POOL_SIZE - int(os.getenv("GOV_DB_RESERVE", "8"))),
+    "cpu": int(os.getenv("GOV_CPU_SLOTS", str((os.cpu_count() or 2) * 2))),
+}
+
+# Units one running task of a step holds in each budget
+DEFAULT_COST = {"graph": 1, "db": 1, "cpu": 1}
+STEP_COSTS = {
+    # + the GET_LOCK session pinned for the whole account
+    "entities": {"graph": 1, "db": 2, "cpu": 1},
+    "insights": {"graph": 1, "db": 1, "cpu": 1},
+    "creatives": {"graph": 1, "db": 1, "cpu": 1},
+    "billing": {"graph": 1, "db": 1, "cpu": 0},
+    "posts": {"graph": 1, "db": 1, "cpu": 0},
+}
+
+WAIT_POLL_SECONDS = 1.0
+
+
+class ConcurrencyGovernor:
+    def __init__(self, capacity: Dict[str, int]):
+        self.capacity = dict(capacity)
+        self._cond = threading.Condition()
+        self._used = {b: 0 for b in self.capacity}
+        self._step_used: Dict[str, Dict[str, int]] = {}
+        self._running: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+
+    def _cost(self, step: str) -> Dict[str, int]:
+        return STEP_COSTS.get(step, DEFAULT_COST)
+
+    def _active_steps(self) -> int:
+        steps = {s for s, n in self._running.items() if n} | {s for s, n in self._waiting.items() if n}
+        return max(1, len(steps))
+
+    def _fits(self, step: str) -> bool:
+        active = self._active_steps()
+        step_used = self._step_used.get(step, {})
+        for budget, cost in self._cost(step).items():
+            if cost <= 0:
+                continue
+            cap = self.capacity[budget]
+            share = max(cost, cap // active)
+            if step_used.get(budget, 0) + cost > share:
+                return False
+            # A lone task may always run, even if the budget is set below its cost
+            if self._used[budget] + cost > cap and self._used[budget] > 0:
+                return False
+        return True
+
+    def max_workers(self, step: str) -> int:
+        """Most tasks of `step` that could ever run at once (whole budget to itself)."""
+        limits = [
+            self.capacity[b] // c
+            for b, c in self._cost(step).items()
+            if c > 0
+        ]
+        return max(1, min(limits)) if limits else 1
+
+    @contextmanager
+    def slot(self, step: str, cancel_token=None):
+        """
+        Hold one task slot for `step`. Blocks until it fits the step's share.
+        A cancelled job stops waiting and runs ungoverned; the task then
+        fails fast at its own cancellation check.
+        """
+        if not GOVERNOR_ENABLED:
+            yield
+            return
+
+        acquired = False
+        with self._cond:
+            self._waiting[step] = self._waiting.get(step, 0) + 1
+            try:
+                while not self._fits(step):
+                    if cancel_token is not None and cancel_token.is_cancelled():
+                        break
+                    self._cond.wait(WAIT_POLL_SECONDS)
+                else:
+                    acquired = True
+            finally:
+                self._waiting[step] -= 1
+
+            if acquired:
+                step_used = self._step_used.setdefault(step, {})
+                for budget, cost in self._cost(step).items():
+                    self._used[budget] += cost
+                    step_used[budget] = step_used.get(budget, 0) + cost
+                self._running[step] = self._running.get(step, 0) + 1
+
+        try:
+            yield
+        finally:
+            if acquired:
+                with self._cond:
+                    step_used = self._step_used[step]
+                    for budget, cost in self._cost(step).items():
+                        self._used[budget] -= cost
+                        step_used[budget] -= cost
+                    self._running[step] -= 1
+                    # Freed units (or a finished step) change everyone's share
+                    self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "capacity": dict(self.capacity),
+                "used": dict(self._used),
+                "running": {s: n for s, n in self._running.items() if n},
+                "waiting": {s: n for s, n in self._waiting.items() if n},
+            }
+
+
+GOVERNOR = ConcurrencyGovernor(CAPACITY)
+
+
+def governed(step: str, fn: Callable, cancel_token=None) -> Callable:
+    """Wrap a worker task so it runs inside a governor slot."""
+    def _run(*args, **kwargs):
+        with GOVERNOR.slot(step, cancel_token):
+            return fn(*args, **kwargs)
+    return _run
+
+
+def workers_for(step: str, default: int) -> int:
+    """
+    Executor size for a worker: the step's default, or SYNC_WORKERS when set.
+    With the governor on it is also capped by what the budgets could ever
+    run at once for the step (GOVERNOR.max_workers).
+    """
+    env: Optional[str] = os.getenv("SYNC_WORKERS")
+    workers = int(env or default)
+    if not GOVERNOR_ENABLED:
+        return workers
+    workers = min(workers, GOVERNOR.max_workers(step))
+    logger.info(f"🎛️ governor {step}: pool={workers} budgets={GOVERNOR.capacity}")
+    return max(1, workers)
@@ -3,12 +3,18 @@
 from __future__ import annotations
 
 import json
+import os
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Optional
 
 from logs.logger import logger
 from integrations.meta_graph_client import MetaGraphClient
 from db.db import execute, query_dict
+from services._stream_writer import StreamingUpserter
+from db.repositories.creative_specs_repo import (
+    canonical_spec,
+    store_specs,
+)
 
 
 # =========================
@@ -61,37 +67,34 @@ def _json_or_none(x: Any):
 # =========================
 # DB upserts
 # =========================
-def upsert_creative(record: dict) -> None:
+def upsert_creatives_batch(records: list[dict]) -> int:
     """
-    Upsert into creative_ads (your table).
+    Multi-row upsert into creative_ads.
+    Creatives shared by many ads are written once (last record wins).
     """
+    if not records:
+        return 0
+
+    unique = {}
+    for r in records:
+        unique[r["creative_id"]] = r
+    rows = sorted(unique.values(), key=lambda x: x["creative_id"])
+
+    # Specs go to creative_specs once per hash; rows only carry spec_hash.
+    # A legacy inline creative_sourcing_spec is cleared once its row has a
+    # hash (read specs with creative_specs_repo.load_creative_spec).
+    # (schema: db.migrations)
+    store_specs({r["spec_hash"]: r["spec_raw"] for r in rows if r.get("spec_hash")})
+
     sql = """
     INSERT INTO creative_ads (
-        creative_id,
-        name,
-        body,
-        effective_object_story_id,
-        instagram_permalink_url,
-        link_url,
-        page_id,
-        thumbnail_url,
-        video_id,
-        creative_sourcing_spec,
-        first_seen_at,
-        last_seen_at
+        creative_id, name, body, effective_object_story_id,
+        instagram_permalink_url, link_url, page_id, thumbnail_url,
+        video_id, spec_hash, first_seen_at, last_seen_at
     ) VALUES (
-        %(creative_id)s,
-        %(name)s,
-        %(body)s,
-        %(effective_object_story_id)s,
-        %(instagram_permalink_url)s,
-        %(link_url)s,
-        %(page_id)s,
-        %(thumbnail_url)s,
-        %(video_id)s,
-        %(creative_sourcing_spec)s,
-        NOW(),
-        NOW()
+        %(creative_id)s, %(name)s, %(body)s, %(effective_object_story_id)s,
+        %(instagram_permalink_url)s, %(link_url)s, %(page_id)s, %(thumbnail_url)s,
+        %(video_id)s, %(spec_hash)s, NOW(), NOW()
     )
     ON DUPLICATE KEY UPDATE
         name = COALESCE(VALUES(name), name),
@@ -102,11 +105,53 @@ def upsert_creative(record: dict) -> None:
         page_id = COALESCE(VALUES(page_id), page_id),
         thumbnail_url = COALESCE(VALUES(thumbnail_url), thumbnail_url),
         video_id = COALESCE(VALUES(video_id), video_id),
-        creative_sourcing_spec = COALESCE(VALUES(creative_sourcing_spec), creative_sourcing_spec),
+        creative_sourcing_spec = IF(VALUES(spec_hash) IS NULL, creative_sourcing_spec, NULL),
+        spec_hash = COALESCE(VALUES(spec_hash), spec_hash),
         last_seen_at = NOW(),
         updated_at = NOW();
     """
-    execute(sql, record)
+    from db.db import get_connection
+    conn = get_connection()
+    cursor = conn.cursor(buffered=True)
+    CHUNK_SIZE = 50
+    try:
+        for i in range(0, len(rows), CHUNK_SIZE):
+            cursor.executemany(sql, rows[i:i + CHUNK_SIZE])
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return len(rows)
+
+
+def _creative_record(creative: dict) -> dict:
+    """Graph creative{} -> creative_ads row."""
+    eosid = creative.get("effective_object_story_id")
+    spec = canonical_spec(creative.get("object_story_spec"))
+
+    # Extract Page ID
+    page_id = None
+    if eosid and "_" in str(eosid):
+        page_id = str(eosid).split("_")[0]
+
+    return {
+        "creative_id": int(creative["id"]),
+        "name": creative.get("name"),
+        "body": creative.get("body"),
+        "effective_object_story_id": eosid,
+        "instagram_permalink_url": creative.get("instagram_permalink_url"),
+        "link_url": creative.get("link_url"),
+        "page_id": page_id,
+        "thumbnail_url": creative.get("thumbnail_url"),
+        "video_id": creative.get("video_id"),
+        # object_story_spec lives in creative_specs (see upsert_creatives_batch)
+        "spec_hash": spec[0] if spec else None,
+        "spec_raw": spec[1] if spec else None,
+    }
 
 
 def update_ad_with_creative(
@@ -145,9 +190,83 @@ def update_ad_with_creative(
     })
 
 
+def link_ads_to_creatives_batch(links: list[dict]) -> int:
+    """
+    Batch version of update_ad_with_creative.
+    links: {ad_id, creative_id, post_id, thumbnail_url, post_link}
+    Loads a temporary mapping table on one connection, then a single
+    UPDATE ads ... JOIN applies it (same COALESCE rules as the per-row update).
+    """
+    if not links:
+        return 0
+
+    unique = {}
+    for r in links:
+        unique[r["ad_id"]] = r
+    rows = sorted(unique.values(), key=lambda x: x["ad_id"])
+
+    from db.db import get_connection
+    conn = get_connection()
+    cursor = conn.cursor(buffered=True)
+    CHUNK_SIZE = 50
+    try:
+        cursor.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS tmp_ad_creative_links (
+                ad_id BIGINT NOT NULL PRIMARY KEY,
+                creative_id BIGINT NULL,
+                post_id VARCHAR(255) NULL,
+                thumbnail_url TEXT NULL,
+                post_link TEXT NULL
+            )
+        """)
+        cursor.execute("DELETE FROM tmp_ad_creative_links")
+
+        insert_sql = """
+        INSERT INTO tmp_ad_creative_links (ad_id, creative_id, post_id, thumbnail_url, post_link)
+        VALUES (%(ad_id)s, %(creative_id)s, %(post_id)s, %(thumbnail_url)s, %(post_link)s)
+        """
+        for i in range(0, len(rows), CHUNK_SIZE):
+            cursor.executemany(insert_sql, rows[i:i + CHUNK_SIZE])
+
+        cursor.execute("""
+            UPDATE ads a
+            JOIN tmp_ad_creative_links t ON t.ad_id = a.ad_id
+            SET
+                a.creative_id = t.creative_id,
+                a.post_id = COALESCE(t.post_id, a.post_id),
+                a.thumbnail_url = COALESCE(t.thumbnail_url, a.thumbnail_url),
+                a.post_link = COALESCE(t.post_link, a.post_link),
+                a.updated_at = NOW()
+        """)
+        conn.commit()
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_ad_creative_links")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return len(rows)
+
+
+def _ad_creative_link(ad_id: int, creative: dict) -> dict:
+    """Graph creative{} of an ad -> link_ads_to_creatives_batch row."""
+    return {
+        "ad_id": ad_id,
+        "creative_id": int(creative["id"]),
+        "post_id": creative.get("effective_object_story_id"),
+        "thumbnail_url": creative.get("thumbnail_url"),
+        "post_link": creative.get("instagram_permalink_url") or creative.get("link_url"),
+    }
+
+
 # =========================
 # Service
 # =========================
+# Creative payloads are heavy (object_story_spec); smaller pages = fewer oversized responses
+CREATIVES_PAGE_LIMIT = int(os.getenv("CREATIVES_PAGE_LIMIT", "100"))
+
 ADS_WITH_CREATIVE_FIELDS = (
     "id,name,effective_status,"
     "creative{"
@@ -181,58 +300,34 @@ def sync_creatives_for_account(
     # 3. Correctly structure the params
     params = {
         "fields": ADS_WITH_CREATIVE_FIELDS, 
-        "limit": 200, # Creative objects are heavy; 100 is safer than 250
+        "limit": CREATIVES_PAGE_LIMIT,
         "filtering": json.dumps(filters) if filters else None
     }
 
-    saved, skipped = 0, 0
+    skipped = 0
+    creatives = []
     logger.info(f"▶️ creatives sync start {act} mode={mode}")
 
+    def _write(links):
+        # One page: creatives (deduplicated) first, then the ad -> creative links
+        upsert_creatives_batch(creatives)
+        creatives.clear()
+        link_ads_to_creatives_batch(links)
+        logger.info(f"⏳ {act} progress: {writer.saved + len(links)} creatives saved...")
+
     try:
-        for ad in client.get_paged(f"{act}/ads", params=params):
-            ad_id = int(ad["id"])
-            creative = ad.get("creative")
-            
-            if not creative or not creative.get("id"):
-                skipped += 1
-                continue
-
-            cr_id = int(creative["id"])
-            eosid = creative.get("effective_object_story_id")
-            
-            # Extract Page ID
-            page_id = None
-            if eosid and "_" in str(eosid):
-                page_id = str(eosid).split("_")[0]
-
-            # 4. Upsert the Creative Metadata
-            upsert_creative({
-                "creative_id": cr_id,
-                "name": creative.get("name"),
-                "body": creative.get("body"),
-                "effective_object_story_id": eosid,
-                "instagram_permalink_url": creative.get("instagram_permalink_url"),
-                "link_url": creative.get("link_url"),
-                "page_id": page_id,
-                "thumbnail_url": creative.get("thumbnail_url"),
-                "video_id": creative.get("video_id"),
-                "creative_sourcing_spec": json.dumps(creative.get("object_story_spec")) if creative.get("object_story_spec") else None,
-            })
-
-            # 5. Link the Ad to the Creative
-            update_ad_with_creative(
-                ad_id=ad_id,
-                creative_id=cr_id,
-                effective_object_story_id=eosid,
-                thumbnail_url=creative.get("thumbnail_url"),
-                link_url=creative.get("link_url"),
-                instagram_permalink_url=creative.get("instagram_permalink_url"),
-            )
-            saved += 1
-            if saved % 50 == 0:
-                logger.info(f"⏳ {act} progress: {saved} creatives saved...")
+        with StreamingUpserter(_write, "ad_id", max_rows=CREATIVES_PAGE_LIMIT) as writer:
+            for ad in client.get_paged(f"{act}/ads", params=params):
+                creative = ad.get("creative")
+
+                if not creative or not creative.get("id"):
+                    skipped += 1
+                    continue
+
+                creatives.append(_creative_record(creative))
+                writer.add(_ad_creative_link(int(ad["id"]), creative))
 
-        return {"saved": saved, "skipped": skipped}
+        return {"saved": writer.saved, "skipped": skipped}
 
     except Exception as e:
         # Fallback logic for filtering errors
@@ -0,0 +1,119 @@
+# services/entities_nested_service.py
+"""
+Campaigns -> adsets -> ads in ONE paged traversal using nested field expansion:
+
+    act_X/campaigns?fields=...,adsets.limit(N){...,ads.limit(N){...}}
+
+Produces the same records as the flat syncs (campaigns/adsets/ads services)
+and writes them with the same batch upserts. Raises MetaPayloadTooLargeError
+when Meta refuses the payload; the caller falls back to flat traversal.
+"""
+import os
+from typing import Any, Dict, Generator
+
+from logs.logger import logger
+from utils.datetime_utils import max_meta_datetime
+from services.campaigns_service import CAMPAIGN_FIELDS, _campaign_record, upsert_campaigns_batch
+from services.adsets_service import ADSET_FIELDS, _adset_record
+from services.ads_service import (
+    ADS_FIELDS,
+    ADS_WITH_CREATIVE_UNION_FIELDS,
+    SINGLE_PASS_CREATIVES,
+    _ad_record,
+    _ad_with_creative_record,
+    _normalize_keys,
+    upsert_ads_batch,
+    upsert_ads_with_creative_batch,
+)
+from services.creatives_service import _creative_record, upsert_creatives_batch
+from db.repositories.adsets_repo import upsert_adsets_batch
+
+CAMPAIGNS_PAGE = int(os.getenv("ENTITIES_NESTED_CAMPAIGNS_LIMIT", "25"))
+CHILD_LIMIT = int(os.getenv("ENTITIES_NESTED_CHILD_LIMIT", "50"))
+
+
+def _nested_fields() -> str:
+    ads_fields = ADS_WITH_CREATIVE_UNION_FIELDS if SINGLE_PASS_CREATIVES else ADS_FIELDS
+    return (
+        f"{CAMPAIGN_FIELDS},"
+        f"adsets.limit({CHILD_LIMIT}){{{ADSET_FIELDS},"
+        f"ads.limit({CHILD_LIMIT}){{{ads_fields}}}}}"
+    )
+
+
+def _edge_items(client, edge: Any) -> Generator[Dict[str, Any], None, None]:
+    """Items of a nested edge, following the edge's own paging.next."""
+    if not isinstance(edge, dict):
+        return
+    for item in edge.get("data", []):
+        yield item
+    next_url = (edge.get("paging") or {}).get("next")
+    if next_url:
+        yield from client.get_paged(next_url, params=None)
+
+
+def sync_entities_nested_for_account(client, ad_account_id: int) -> Dict[str, Dict[str, Any]]:
+    act = f"act_{ad_account_id}"
+
+    campaigns, adsets, ads, creatives = [], [], [], []
+    max_c = max_s = max_a = None
+
+    params = {"fields": _nested_fields(), "limit": CAMPAIGNS_PAGE}
+    for raw_c in client.get_paged(f"{act}/campaigns", params=params):
+        c = _normalize_keys(raw_c)
+        campaigns.append(_campaign_record(c, ad_account_id))
+        max_c = max_meta_datetime(max_c, c.get("updated_time"))
+
+        for raw_s in _edge_items(client, c.get("adsets")):
+            s = _normalize_keys(raw_s)
+            s.setdefault("campaign_id", c["id"])
+            adsets.append(_adset_record(s, ad_account_id))
+            max_s = max_meta_datetime(max_s, s.get("updated_time"))
+
+            for raw_a in _edge_items(client, s.get("ads")):
+                a = _normalize_keys(raw_a)
+                a.setdefault("adset_id", s["id"])
+                a.setdefault("campaign_id", c["id"])
+                max_a = max_meta_datetime(max_a, a.get("updated_time"))
+                if SINGLE_PASS_CREATIVES:
+                    record = _ad_with_creative_record(a)
+                    if record["creative_id"]:
+                        creatives.append(_creative_record(a["creative"]))
+                    ads.append(record)
+                else:
+                    ads.append(_ad_record(a))
+
+    # Parents first, same order and sorting as the flat syncs
+    campaigns.sort(key=lambda x: x["campaign_id"])
+    adsets.sort(key=lambda x: x["adset_id"])
+    ads.sort(key=lambda x: x["ad_id"])
+
+    upsert_campaigns_batch(campaigns)
+    upsert_adsets_batch(adsets)
+    saved_creatives = 0
+    if SINGLE_PASS_CREATIVES:
+        saved_creatives = upsert_creatives_batch(creatives)
+        upsert_ads_with_creative_batch(ads)
+    else:
+        upsert_ads_batch(ads)
+
+    logger.info(
+        f"🌳 nested entities {act} C={len(campaigns)} A={len(adsets)} D={len(ads)}"
+    )
+
+    return {
+        "campaigns": {
+            "level": "Campaigns", "account": act, "saved": len(campaigns), "complete": True,
+            "max_updated_time": max_c,
+            "touched_campaigns": {r["campaign_id"] for r in campaigns},
+        },
+        "adsets": {
+            "level": "Adsets", "account": act, "saved": len(adsets), "ok": True, "complete": True,
+            "max_updated_time": max_s,
+            "touched_adsets": {r["adset_id"] for r in adsets},
+        },
+        "ads": {
+            "level": "Ads", "account": act, "saved": len(ads), "complete": True,
+            "creatives": saved_creatives, "ok": True, "max_updated_time": max_a,
+        },
+    }
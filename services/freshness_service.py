@@ -0,0 +1,87 @@
+# services/freshness_service.py
+"""
+Freshness bookkeeping for the staleness-driven scheduler.
+
+Each (entity type, scope) has a target staleness in seconds; scope is the
+ad account id, or "all" for global entities (pages). Last successful
+refreshes live in sync_checkpoints under entity "fresh.<entity>".
+Work is ranked by age / target, most overdue first.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db.repositories.sync_checkpoints_repo import get_last_success_map, set_last_success
+from db.repositories.job_progress_repo import mark_account_done
+
+FRESH_PREFIX = "fresh."
+
+# entity -> target staleness (seconds); override with SCHED_TARGETS="insights=3600,billing=900"
+DEFAULT_TARGETS = {
+    "insights": 3600,
+    "billing": 900,
+    "entities": 3600,
+    "creatives": 6 * 3600,
+    "pages": 86400,
+}
+
+# entities refreshed once for everything rather than per account
+GLOBAL_ENTITIES = {"pages"}
+
+# entities whose cadence stays fixed: billing is the cheap probe that
+# notices a dormant account waking up
+UNWEIGHTED_ENTITIES = {"pages", "billing"}
+
+
+def load_targets() -> Dict[str, int]:
+    targets = dict(DEFAULT_TARGETS)
+    for part in (os.getenv("SCHED_TARGETS") or "").split(","):
+        if "=" not in part:
+            continue
+        name, value = part.split("=", 1)
+        targets[name.strip()] = int(value)
+    return targets
+
+
+def mark_fresh(entity: str, scope_key: str) -> None:
+    set_last_success(FRESH_PREFIX + entity, scope_key)
+
+
+def account_refreshed(job_id, step: str, ad_account_id: int) -> None:
+    """
+    Shared per-account completion path (pipeline workers, sync_tasks):
+    job progress for resumes + freshness, so the scheduler doesn't refetch
+    what a pipeline run just refreshed.
+    """
+    mark_account_done(job_id, step, ad_account_id)
+    mark_fresh(step, str(int(ad_account_id)))
+
+
+def stale_items(targets: Dict[str, int], accounts: List[dict],
+                multiplier: Optional[Callable[[int], float]] = None) -> List[Tuple[float, str, str, dict]]:
+    """
+    [(overdue ratio, entity, scope_key, account row or {}), ...] for every
+    item at or past its target, most overdue first. Never-synced = infinitely stale.
+    multiplier(ad_account_id) stretches the target of weighted entities.
+    """
+    now = datetime.now(timezone.utc)
+    last = get_last_success_map(FRESH_PREFIX)
+    out = []
+
+    for entity, target in targets.items():
+        scopes = (
+            [("all", {})]
+            if entity in GLOBAL_ENTITIES
+            else [(str(a["ad_account_id"]), a) for a in accounts]
+        )
+        for scope, acc in scopes:
+            seen = last.get((FRESH_PREFIX + entity, scope))
+            eff_target = target
+            if multiplier and acc and entity not in UNWEIGHTED_ENTITIES:
+                eff_target = target * multiplier(int(acc["ad_account_id"]))
+            ratio = float("inf") if seen is None else (now - seen).total_seconds() / max(1, eff_target)
+            if ratio >= 1:
+                out.append((ratio, entity, scope, acc))
+
+    out.sort(key=lambda x: -x[0])
+    return out
@@ -8,7 +8,13 @@ from typing import Any, Dict, Optional, Tuple
 
 from logs.logger import logger
 from integrations.meta_graph_client import MetaGraphClient, MetaObjectAccessError
-from db.db import execute
+from db.db import execute, execute_many, query_dict
+from services._insights_batch import FP_SCALE, transform_insights_page
+from db.repositories.account_daily_insights_repo import (
+    ensure_account_daily_insights_table,
+    upsert_account_window_insights,
+)
+from db.repositories.rolling_5d_repo import refresh_rolling_5d_for_ads
 
 
 # =========================
@@ -170,6 +176,82 @@ def upsert_ad_daily_insight(r: dict) -> None:
     """
     execute(sql, r)
 
+# level -> (insights table, id column, parent table)
+_INSIGHT_TABLES = {
+    "campaign": ("campaigns_daily_insights", "campaign_id", "campaigns"),
+    "adset": ("adset_daily_insights", "adset_id", "adsets"),
+    "ad": ("ad_daily_insights", "ad_id", "ads"),
+    "account": ("account_daily_insights", "ad_account_id", "ad_accounts"),
+}
+
+def _existing_ids(parent: str, id_col: str, ids: list) -> set:
+    placeholders = ",".join(["%s"] * len(ids))
+    rows = query_dict(
+        f"SELECT {id_col} FROM {parent} WHERE {id_col} IN ({placeholders})",
+        tuple(ids),
+    )
+    return {int(r[id_col]) for r in rows}
+
+def upsert_daily_insights_batch(level: str, cols: dict) -> int:
+    """
+    Multi-row upsert of one page produced by transform_insights_page().
+    Parent rows are checked with one IN() query per page (instead of a
+    WHERE EXISTS per row) and fixed-point columns are scaled back in SQL.
+    """
+    ids = cols["ids"]
+    if not ids:
+        return 0
+
+    table, id_col, parent = _INSIGHT_TABLES[level]
+    if level == "account":
+        ensure_account_daily_insights_table()
+    known = _existing_ids(parent, id_col, sorted(set(ids)))
+
+    rows = [
+        r for r in zip(
+            ids, cols["dates"], cols["results"], cols["cpr_fp"],
+            cols["spend_fp"], cols["impressions"], cols["reach"], cols["frequency_fp"],
+        )
+        if r[0] in known
+    ]
+    if not rows:
+        return 0
+    rows.sort(key=lambda r: (r[0], r[1]))  # stable lock order
+
+    sql = f"""
+    INSERT INTO {table} (
+        {id_col}, date, results, cost_per_result, spend, impressions, reach, frequency, checked_at
+    ) VALUES (
+        %s, %s, %s, %s / {FP_SCALE}, %s / {FP_SCALE}, %s, %s, %s / {FP_SCALE}, NOW()
+    )
+    ON DUPLICATE KEY UPDATE
+        results=VALUES(results),
+        cost_per_result=VALUES(cost_per_result),
+        spend=VALUES(spend),
+        impressions=VALUES(impressions),
+        reach=VALUES(reach),
+        frequency=VALUES(frequency),
+        checked_at=NOW();
+    """
+    execute_many(sql, rows)
+    return len(rows)
+
+def _refresh_rollups_for_page(cols: dict) -> None:
+    """
+    Keep ad_rolling_5d / campaign_rolling_5d in step with the ad rows just
+    written. Only ads with a touched date inside the 5-day window matter
+    (one extra day of slack for UTC vs server date).
+    """
+    window_start = (_utc_now().date() - timedelta(days=6)).isoformat()
+    touched = {ad_id for ad_id, d in zip(cols["ids"], cols["dates"]) if d >= window_start}
+    if not touched:
+        return
+    try:
+        refresh_rolling_5d_for_ads(touched)
+    except Exception as e:
+        # Rollups catch up on the next insights run or the daily rebuild
+        logger.warning(f"⚠️ rolling 5d refresh failed for {len(touched)} ads: {e}")
+
 # =========================
 # Core fetcher
 # =========================
@@ -193,6 +275,20 @@ INSIGHTS_FIELDS = ",".join([
     "cost_per_action_type",
 ])
 
+# level=account rows carry account_id instead of campaign/adset/ad ids
+ACCOUNT_INSIGHTS_FIELDS = ",".join([
+    "account_id",
+    "date_start",
+    "impressions",
+    "reach",
+    "spend",
+    "frequency",
+    "results",
+    "cost_per_result",
+    "actions",
+    "cost_per_action_type",
+])
+
 
 def _date_preset_for_days(days: int) -> str:
     # Graph API presets are limited; use safe fallback.
@@ -213,10 +309,12 @@ def _date_preset_for_days(days: int) -> str:
 def _sync_level_for_account(
     client: MetaGraphClient,
     ad_account_id: int,
-    level: str,                     # campaign | adset | ad
+    level: str,                     # campaign | adset | ad | account
     days: int,
     portfolio_code: str = "",
     progress_every: int = 500,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
 ) -> Dict[str, int]:
     import time
     MAX_RUNTIME_SECONDS = 600 # Increased slightly for empty DB runs
@@ -240,73 +338,62 @@ def _sync_level_for_account(
         "fields": INSIGHTS_FIELDS,
         "time_increment": 1,
         "limit": 200, # Increased from 50 for better throughput
-        "date_preset": _date_preset_for_days(days),
         "filtering": json.dumps(filtering) 
     }
+    # Account level: one row per day, no delivery_info filter available
+    if level == "account":
+        params["fields"] = ACCOUNT_INSIGHTS_FIELDS
+        del params["filtering"]
+    # A time slice (since/until) replaces the preset so one level can be split
+    # into several independent requests.
+    if since and until:
+        params["time_range"] = json.dumps({"since": since, "until": until})
+    else:
+        params["date_preset"] = _date_preset_for_days(days)
 
     saved = 0
     skipped = 0
+    page = []
+
+    window = f"{since}..{until}" if since and until else f"days={days}"
+    logger.info(f"▶️ insights start {act} level={level} {window} filtering={'NONE' if level == 'account' else 'ACTIVE_ONLY'}")
+
+    def _flush() -> None:
+        # Transform + write one page in bulk (services/_insights_batch.py)
+        nonlocal saved, skipped
+        if not page:
+            return
+        rows = page[:]
+        page.clear()
+        cols = transform_insights_page(rows, level)
+        skipped += cols["skipped"]
+        try:
+            upsert_daily_insights_batch(level, cols)
+            if level == "ad":
+                _refresh_rollups_for_page(cols)
+            before = saved
+            saved += len(cols["ids"])
+            if saved // progress_every > before // progress_every:
+                logger.info(f"⏳ insights {act} {level}: {saved} rows...")
+        except Exception as page_err:
+            skipped += len(cols["ids"])
+            logger.warning(f"⚠️ insights page skipped {act} level={level}: {page_err}")
 
-    logger.info(f"▶️ insights start {act} level={level} days={days} filtering=ACTIVE_ONLY")
-    
     try:
         # 2. Meta Insights can be slow; we use a generator to process as they arrive
         for row in client.get_paged(endpoint, params=params):
             if time.time() - start_time > MAX_RUNTIME_SECONDS:
                 logger.error(f"⛔ timeout {act} level={level} after {saved} records")
-                break   
-            
-            try:
-                row = row or {}
-                d = _to_date(row.get("date_start"))
-                if not d:
-                    skipped += 1
-                    continue
-                
-                # Extract metrics
-                impressions = _to_int(row.get("impressions"), default=0)
-                reach = _to_int(row.get("reach"), default=0)
-                spend = _to_decimal(row.get("spend"))
-                freq = _to_decimal(row.get("frequency"))
-                results, cpr = _pick_results_and_cpr(row)
-
-                # 3. Targeted Upserts
-                if level == "campaign":
-                    obj_id = row.get("campaign_id")
-                    if obj_id:
-                        upsert_campaign_daily_insight({
-                            "campaign_id": int(obj_id), "date": d, "results": results,
-                            "cost_per_result": cpr, "spend": spend, "impressions": impressions,
-                            "reach": reach, "frequency": freq
-                        })
-                
-                elif level == "adset":
-                    obj_id = row.get("adset_id")
-                    if obj_id:
-                        upsert_adset_daily_insight({
-                            "adset_id": int(obj_id), "date": d, "results": results,
-                            "cost_per_result": cpr, "spend": spend, "impressions": impressions,
-                            "reach": reach, "frequency": freq
-                        })
-
-                elif level == "ad":
-                    obj_id = row.get("ad_id")
-                    if obj_id:
-                        upsert_ad_daily_insight({
-                            "ad_id": int(obj_id), "date": d, "results": results,
-                            "cost_per_result": cpr, "spend": spend, "impressions": impressions,
-                            "reach": reach, "frequency": freq
-                        })
-
-                saved += 1
-                if saved % progress_every == 0:
-                    logger.info(f"⏳ insights {act} {level}: {saved} rows...")
-
-            except Exception as row_err:
-                skipped += 1
-                continue
+                break
+
+            page.append(row)
+            if len(page) >= params["limit"]:
+                _flush()
+
+        _flush()
 
     except Exception as e:
+        _flush()  # keep whatever was already fetched
         logger.error(f"❌ insights fetch failed {act} {level}: {e}")
         # We don't raise here so that 'adset' can still run if 'campaign' fails
         return {"saved": saved, "skipped": skipped, "error": str(e)}
@@ -320,9 +407,13 @@ def sync_campaign_daily_insights_for_account(
     ad_account_id: int,
     portfolio_code: str = "",
     days: int = 30,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
 ) -> Dict[str, int]:
     try:
-        return _sync_level_for_account(client, ad_account_id, "campaign", days, portfolio_code)
+        return _sync_level_for_account(
+            client, ad_account_id, "campaign", days, portfolio_code, since=since, until=until
+        )
     except Exception as e:
         logger.error(f"❌ campaign insights failed act_{ad_account_id}: {e}")
         return {"saved": 0, "skipped": 0, "error": str(e)}
@@ -333,9 +424,13 @@ def sync_adset_daily_insights_for_account(
     ad_account_id: int,
     portfolio_code: str = "",
     days: int = 30,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
 ) -> Dict[str, int]:
     try:
-        return _sync_level_for_account(client, ad_account_id, "adset", days, portfolio_code)
+        return _sync_level_for_account(
+            client, ad_account_id, "adset", days, portfolio_code, since=since, until=until
+        )
     except Exception as e:
         logger.error(f"❌ adset insights failed act_{ad_account_id}: {e}")
         return {"saved": 0, "skipped": 0, "error": str(e)}
@@ -346,12 +441,63 @@ def sync_ad_daily_insights_for_account(
     ad_account_id: int,
     portfolio_code: str = "",
     days: int = 30,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
 ) -> Dict[str, int]:
     try:
-        return _sync_level_for_account(client, ad_account_id, "ad", days, portfolio_code)
+        return _sync_level_for_account(
+            client, ad_account_id, "ad", days, portfolio_code, since=since, until=until
+        )
     except Exception as e:
         logger.error(f"❌ ad insights failed act_{ad_account_id}: {e}")
         return {"saved": 0, "skipped": 0, "error": str(e)}
+
+# 4. Account level (feeds account_daily_insights / get_facebook_metrics)
+def sync_account_daily_insights_for_account(
+    client: MetaGraphClient,
+    ad_account_id: int,
+    portfolio_code: str = "",
+    days: int = 30,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Dict[str, int]:
+    try:
+        return _sync_level_for_account(
+            client, ad_account_id, "account", days, portfolio_code, since=since, until=until
+        )
+    except Exception as e:
+        logger.error(f"❌ account insights failed act_{ad_account_id}: {e}")
+        return {"saved": 0, "skipped": 0, "error": str(e)}
+
+
+# 5. Account reach over the whole window (one row, de-duplicated by Meta)
+def sync_account_window_reach_for_account(
+    client: MetaGraphClient,
+    ad_account_id: int,
+    portfolio_code: str = "",
+    days: int = 30,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    No time_increment: Graph returns a single row whose reach counts each
+    person once across the window. since/until are ignored (never sliced).
+    """
+    act = f"act_{ad_account_id}"
+    try:
+        data = client.get(f"{act}/insights", params={
+            "level": "account",
+            "fields": "account_id,date_start,date_stop,reach,impressions",
+            "date_preset": _date_preset_for_days(days),
+        })
+        rows = data.get("data") or []
+        if not rows:
+            return {"saved": 0, "skipped": 0}
+        upsert_account_window_insights(ad_account_id, days, rows[0])
+        return {"saved": 1, "skipped": 0}
+    except Exception as e:
+        logger.error(f"❌ account window reach failed {act}: {e}")
+        return {"saved": 0, "skipped": 0, "error": str(e)}
     
 
 #     def _sync_level_for_account(
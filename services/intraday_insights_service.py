@@ -0,0 +1,59 @@
+# services/intraday_insights_service.py
+"""
+Intraday (today only) hourly ad insights for spend pacing.
+Independent of the daily pipeline: small payload, active ads only.
+"""
+import json
+from typing import Dict
+
+from logs.logger import logger
+from integrations.meta_graph_client import MetaGraphClient
+from services._insights_batch import HOURLY_BREAKDOWN, transform_insights_page
+from db.repositories.ad_hourly_insights_repo import upsert_ad_hourly_insights_batch
+
+HOURLY_FIELDS = "ad_id,date_start,spend,impressions,results,actions"
+
+PAGE_SIZE = 500
+
+
+def sync_ad_hourly_insights_for_account(
+    client: MetaGraphClient,
+    ad_account_id: int,
+) -> Dict[str, int]:
+    act = f"act_{ad_account_id}"
+
+    params = {
+        "level": "ad",
+        "fields": HOURLY_FIELDS,
+        "breakdowns": HOURLY_BREAKDOWN,
+        "date_preset": "today",
+        "limit": PAGE_SIZE,
+        "filtering": json.dumps([
+            {"field": "ad.effective_status", "operator": "IN", "value": ["ACTIVE"]}
+        ]),
+    }
+
+    saved = 0
+    skipped = 0
+    page = []
+
+    def _flush() -> None:
+        nonlocal saved, skipped
+        if not page:
+            return
+        cols = transform_insights_page(page, "ad", hourly=True)
+        page.clear()
+        skipped += cols["skipped"]
+        saved += upsert_ad_hourly_insights_batch(cols)
+
+    try:
+        for row in client.get_paged(f"{act}/insights", params=params):
+            page.append(row)
+            if len(page) >= PAGE_SIZE:
+                _flush()
+        _flush()
+    except Exception as e:
+        logger.error(f"❌ hourly insights failed {act}: {e}")
+        return {"saved": saved, "skipped": skipped, "error": str(e)}
+
+    return {"saved": saved, "skipped": skipped}
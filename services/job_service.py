@@ -1,7 +1,25 @@
+import os
+import socket
+
+from mysql.connector import errorcode, errors
+
 from db.db import execute, get_connection, query_dict
+from services.bookkeeping_writer import WRITER
+
+# 0 = write heartbeats/log rows inline (old behaviour)
+BOOKKEEPING_ASYNC = os.getenv("BOOKKEEPING_ASYNC", "1") == "1"
+
+# Local UDP port the pipeline daemon listens on for wakeups (0 = poll only)
+PIPELINE_DAEMON_WAKE_PORT = int(os.getenv("PIPELINE_DAEMON_WAKE_PORT", "47811"))
 
 
 def create_job(include_static=None, include_insights=True):
+    """
+    Inserts a PENDING job. Returns None when another job is already
+    PENDING/RUNNING (unique active-job index, see db.migrations), so two
+    triggers can't both win.
+    """
+
     sql = """
     INSERT INTO pipeline_jobs (job_type, include_static, include_insights)
     VALUES ('full_pipeline', %(include_static)s, %(include_insights)s)
@@ -23,6 +41,11 @@ def create_job(include_static=None, include_insights=True):
 
         return cursor.lastrowid
 
+    except errors.IntegrityError as e:
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return None
+        raise
+
     finally:
         if cursor:
             cursor.close()
@@ -30,6 +53,27 @@ def create_job(include_static=None, include_insights=True):
         if conn:
             conn.close()  # ⭐ THIS IS THE FIX
 
+def notify_daemon():
+    """Fire-and-forget wakeup so the daemon picks up a new job without waiting a poll."""
+    if not PIPELINE_DAEMON_WAKE_PORT:
+        return
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(b"job", ("127.0.0.1", PIPELINE_DAEMON_WAKE_PORT))
+    except OSError:
+        # the daemon still finds the job on its next poll
+        pass
+
+
+def claim_pending_job(job_id) -> bool:
+    """PENDING -> RUNNING only if nobody else got it first."""
+    return execute("""
+        UPDATE pipeline_jobs
+        SET status='RUNNING', started_at=NOW()
+        WHERE id=%s AND status='PENDING'
+    """, (job_id,)) == 1
+
+
 def get_pending_jobs(limit=1):
     return query_dict("""
         SELECT * FROM pipeline_jobs
@@ -86,6 +130,9 @@ def cleanup_stuck_jobs():
 
 
 def log_step(job_id, step, status, message=""):
+    if BOOKKEEPING_ASYNC:
+        WRITER.log(job_id, step, status, message)
+        return
     execute("""
         INSERT INTO pipeline_job_logs (job_id, step_name, status, message)
         VALUES (%(job_id)s, %(step)s, %(status)s, %(message)s)
@@ -96,9 +143,21 @@ def log_step(job_id, step, status, message=""):
         "message": message
     })
 def heartbeat(job_id):
+    if BOOKKEEPING_ASYNC:
+        # coalesced into one UPDATE per tick
+        WRITER.heartbeat(job_id)
+        return
     execute("UPDATE pipeline_jobs SET updated_at = NOW() WHERE id = %s", (job_id,))    
 
+
+def flush_bookkeeping():
+    """Write out buffered heartbeats/log rows now (e.g. before reading job logs)."""
+    WRITER.flush()
+
 def log_error(job_id, step, ad_account_id, error_message):
+    if BOOKKEEPING_ASYNC:
+        WRITER.log(job_id, f"{step}:act_{ad_account_id}", "FAILED", error_message)
+        return
     execute("""
         INSERT INTO pipeline_job_logs
         (job_id, step_name, status, message)
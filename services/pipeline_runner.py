@@ -1,4 +1,8 @@
+import os
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
+from mysql.connector import errorcode, errors
 from db.db import execute, query_dict
 from logs.logger import logger
 
@@ -14,7 +18,123 @@ from workers import (
     creative_worker,
 )
 
-from services.job_service import update_job_status, log_step
+from services.job_service import update_job_status, log_step, flush_bookkeeping, notify_daemon
+from services.task_queue_service import TASK_HANDLERS, run_step_via_tasks
+from db.repositories.job_progress_repo import completed_steps, mark_step_done
+from services.freshness_service import GLOBAL_ENTITIES, mark_fresh
+from services.cancellation import JobCancelledError, register, release, token_for
+
+
+# =========================
+# Step graph
+# =========================
+# name -> (run function, steps it depends on)
+# A dependency that isn't part of the job's step set counts as satisfied.
+STEP_GRAPH = {
+    "ad_accounts": (ad_accounts_worker.run, ()),
+    "pages": (pages_worker.run, ()),
+    "entities": (entities_worker.run, ("ad_accounts",)),
+    "posts": (posts_worker.run, ("pages",)),
+    "creatives": (creative_worker.run, ("entities",)),
+    "insights": (insights_worker.run, ("entities",)),
+    "billing": (billing_worker.run, ("ad_accounts",)),
+    "ad_posts": (ad_posts_worker.run, ("entities", "creatives", "posts")),
+    "page_ad_account": (page_ad_account_worker.run, ("entities", "creatives", "pages")),
+}
+
+# Max steps running at the same time within one job
+PIPELINE_MAX_PARALLEL = int(os.getenv("PIPELINE_MAX_PARALLEL", "3"))
+
+# Whole-job deadline in seconds (0 = none); job["deadline_seconds"] overrides
+PIPELINE_JOB_DEADLINE_SECONDS = int(os.getenv("PIPELINE_JOB_DEADLINE_SECONDS", "0"))
+
+# 1 = account-granular steps fan out into sync_tasks (any host can help)
+PIPELINE_TASK_QUEUE = os.getenv("PIPELINE_TASK_QUEUE", "0") == "1"
+
+# 1 = the API runs jobs on its own threads (no workers.pipeline_daemon)
+PIPELINE_IN_PROCESS = os.getenv("PIPELINE_IN_PROCESS", "0") == "1"
+
+
+def _step_func(name):
+    if PIPELINE_TASK_QUEUE and name in TASK_HANDLERS:
+        return lambda job_id=None: run_step_via_tasks(job_id, name)
+    return STEP_GRAPH[name][0]
+
+
+def _job_steps(include_static):
+    if include_static is True:
+        # ad_accounts / pages deliberately not refreshed in static runs
+        return ["ad_posts", "page_ad_account"]
+    if include_static is None:
+        return [
+            "ad_accounts", "pages", "entities", "posts", "creatives",
+            "insights", "billing", "ad_posts", "page_ad_account",
+        ]
+    return [
+        "entities", "posts", "creatives", "insights",
+        "billing", "ad_posts", "page_ad_account",
+    ]
+
+
+def _is_stopped(job_id) -> bool:
+    status_check = query_dict(
+        "SELECT status FROM pipeline_jobs WHERE id=%s",
+        (job_id,)
+    )
+    return bool(status_check) and status_check[0]["status"] == "STOPPED"
+
+
+def _run_step(job_id, name, func):
+    log_step(job_id, name, "START", "started")
+    start_time = datetime.now()
+
+    try:
+        result = func(job_id=job_id)
+    except TypeError:
+        result = func()
+
+    # -----------------------------
+    # STEP FAILED DETECTION
+    # -----------------------------
+    if isinstance(result, dict) and result.get("ok") is False:
+        raise Exception(result.get("error", f"{name} failed"))
+
+    token = token_for(job_id)
+    if token and token.is_cancelled():
+        # Returned early because of the stop/deadline: not complete, don't remember it
+        log_step(job_id, name, "STOPPED", f"cancelled mid-step: {token.reason}")
+        raise JobCancelledError(token.reason)
+
+    failed = result.get("failed", 0) if isinstance(result, dict) else 0
+    if failed:
+        # Some accounts failed: the step is not done and the job fails, so its
+        # retry re-enters the step (skip_completed_accounts filters out the
+        # accounts that already finished)
+        log_step(job_id, name, "PARTIAL", f"{failed} failed: {result}")
+        raise Exception(f"{name}: {failed} account(s) failed")
+
+    log_step(job_id, name, "SUCCESS", str(result))
+    # Remembered for retries of this job (resume skips it)
+    mark_step_done(job_id, name)
+    if name in GLOBAL_ENTITIES:
+        # pages: one refresh for everything, same freshness key as the scheduler
+        mark_fresh(name, "all")
+
+    logger.info(
+        f"✅ {name} done in {(datetime.now() - start_time).seconds}s"
+    )
+    return result
+
+
+def dispatch_job(job):
+    """
+    API side of a trigger. The job row is already PENDING; by default the
+    pipeline daemon runs it, we only wake it up.
+    """
+    if PIPELINE_IN_PROCESS:
+        Thread(target=run_pipeline_job, args=(job,), daemon=True).start()
+    else:
+        notify_daemon()
 
 
 def run_pipeline_job(job):
@@ -23,70 +143,90 @@ def run_pipeline_job(job):
 
     update_job_status(job_id, "RUNNING")
 
-    if include_static is True:
-        steps = [
-            # ("ad_accounts", ad_accounts_worker.run),
-            # ("pages", pages_worker.run),
-            ("ad_posts", ad_posts_worker.run),
-            ("page_ad_account", page_ad_account_worker.run),
-        ]
-    elif include_static is None:
-        steps = [
-            ("ad_accounts", ad_accounts_worker.run),
-            ("pages", pages_worker.run),
-            ("entities", entities_worker.run),
-            ("posts", posts_worker.run),
-            ("creatives", creative_worker.run),
-            ("insights", insights_worker.run),
-            ("billing", billing_worker.run),
-            ("ad_posts", ad_posts_worker.run),
-            ("page_ad_account", page_ad_account_worker.run),
-        ]
-    else:
-        steps = [
-            ("entities", entities_worker.run),
-            ("posts", posts_worker.run),
-            ("creatives", creative_worker.run),
-            ("insights", insights_worker.run),
-            ("billing", billing_worker.run),
-            ("ad_posts", ad_posts_worker.run),
-            ("page_ad_account", page_ad_account_worker.run),
-        ]
+    # Shared with every worker thread of this job (token_for(job_id))
+    token = register(job_id, job.get("deadline_seconds") or PIPELINE_JOB_DEADLINE_SECONDS)
+
+    steps = _job_steps(include_static)
+    in_job = set(steps)
+    deps = {
+        name: [d for d in STEP_GRAPH[name][1] if d in in_job]
+        for name in steps
+    }
+
+    # Retry of this job: steps finished in an earlier attempt are not rerun
+    done = completed_steps(job_id) & set(steps)
+    if done:
+        logger.info(f"⏭️ job {job_id} resuming, already done: {sorted(done)}")
+        for n in steps:
+            if n in done:
+                log_step(job_id, n, "SUCCESS", "skipped: completed in an earlier attempt")
+    pending = [n for n in steps if n not in done]
+    running = {}
+    name = None
 
     try:
-        for name, func in steps:
+        with ThreadPoolExecutor(max_workers=PIPELINE_MAX_PARALLEL) as ex:
+            failure = None
 
-            # STOP CHECK
-            status_check = query_dict(
-                "SELECT status FROM pipeline_jobs WHERE id=%s",
-                (job_id,)
-            )
+            while pending or running:
+                # Start every ready step (deps done) within the budget, in declared order
+                ready = [n for n in pending if all(d in done for d in deps[n])]
+                for n in ready:
+                    if failure or len(running) >= PIPELINE_MAX_PARALLEL:
+                        break
 
-            if status_check and status_check[0]["status"] == "STOPPED":
-                logger.warning(f"🛑 Job stopped before {name}")
-                log_step(job_id, name, "STOPPED", "User stopped job")
-                update_job_status(job_id, "STOPPED")
-                return
+                    # STOP CHECK
+                    if token.is_cancelled() and token.reason == "deadline":
+                        logger.warning(f"⏰ Job deadline reached before {n}")
+                        failure = (n, Exception("job deadline exceeded"))
+                        pending.clear()
+                        break
 
-            log_step(job_id, name, "START", "started")
-            start_time = datetime.now()
+                    if _is_stopped(job_id):
+                        logger.warning(f"🛑 Job stopped before {n}")
+                        log_step(job_id, n, "STOPPED", "User stopped job")
+                        # let running steps finish, start nothing new
+                        pending.clear()
+                        break
 
-            try:
-                result = func(job_id=job_id)
-            except TypeError:
-                result = func()
+                    pending.remove(n)
+                    running[ex.submit(_run_step, job_id, n, _step_func(n))] = n
 
-            # -----------------------------
-            # STEP FAILED DETECTION
-            # -----------------------------
-            if isinstance(result, dict) and result.get("ok") is False:
-                raise Exception(result.get("error", f"{name} failed"))
+                if not running:
+                    if pending and not failure:
+                        raise Exception(f"unsatisfiable step dependencies: {pending}")
+                    break
 
-            log_step(job_id, name, "SUCCESS", str(result))
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for f in finished:
+                    n = running.pop(f)
+                    try:
+                        f.result()
+                        done.add(n)
+                    except JobCancelledError:
+                        # handled after the loop (STOPPED or deadline failure)
+                        name = name or n
+                        pending.clear()
+                    except Exception as e:
+                        # First failure wins; running siblings are allowed to finish
+                        if failure is None:
+                            failure = (n, e)
+                        pending.clear()
 
-            logger.info(
-                f"✅ {name} done in {(datetime.now() - start_time).seconds}s"
-            )
+            if failure:
+                name = failure[0]
+                raise failure[1]
+
+        if token.is_cancelled() and token.reason == "deadline":
+            # Out of time (mid-step or before one): FAILED, so the retry block
+            # below requeues it and the retry resumes from the finished steps
+            name = name or "deadline"
+            raise Exception("job deadline exceeded")
+
+        if len(done) < len(steps) or token.is_cancelled():
+            # User stop: running steps returned early, nothing new started
+            update_job_status(job_id, "STOPPED")
+            return
 
         # FINAL SUCCESS
         update_job_status(job_id, "SUCCESS")
@@ -108,9 +248,20 @@ def run_pipeline_job(job):
                 f"🔄 retry {current_retries+1}/{max_retries} job {job_id}"
             )
 
-            execute("""
-                UPDATE pipeline_jobs
-                SET status='PENDING',
-                    retries=retries+1
-                WHERE id=%s
-            """, (job_id,))
\ No newline at end of file
+            try:
+                execute("""
+                    UPDATE pipeline_jobs
+                    SET status='PENDING',
+                        retries=retries+1
+                    WHERE id=%s
+                """, (job_id,))
+            except errors.IntegrityError as retry_error:
+                if retry_error.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+                # A newer job became active meanwhile (single active job)
+                logger.warning(f"⚠️ retry of job {job_id} skipped: {retry_error}")
+
+    finally:
+        release(job_id)
+        # job is over: buffered step logs shouldn't wait for the next tick
+        flush_bookkeeping()
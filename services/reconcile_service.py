@@ -0,0 +1,82 @@
+# services/reconcile_service.py
+"""
+Archival detection after a FULL entity sweep.
+
+Every upsert stamps the row (campaigns/adsets: last_seen_at, ads: updated_at).
+Rows of the account whose stamp is older than the sweep start were not in
+the Graph response -> Meta archived/deleted them. They are marked
+effective_status='ARCHIVED' with one set-based UPDATE per table; a later
+sweep that sees the object again overwrites the status as usual.
+"""
+from typing import Dict
+
+from logs.logger import logger
+from db.db import execute, ensure_index, query_scalar
+
+DEAD_STATUSES = "('ARCHIVED','DELETED')"
+
+
+def ensure_reconcile_indexes() -> None:
+    """ALTER TABLEs on big tables: run from db.migrations, never from sync threads."""
+    ensure_index("campaigns", "idx_campaigns_account_seen", "ad_account_id, last_seen_at")
+    ensure_index("adsets", "idx_adsets_account_seen", "ad_account_id, last_seen_at")
+    # ads has no ad_account_id; reached through campaigns
+    ensure_index("ads", "idx_ads_campaign_updated", "campaign_id, updated_at")
+
+
+def sweep_started_at():
+    """DB clock (same clock as the NOW() stamps written by the upserts)."""
+    return query_scalar("SELECT NOW()")
+
+
+def archive_missing_entities(ad_account_id: int, started_at, seen: Dict[str, int]) -> Dict[str, int]:
+    """
+    started_at: sweep_started_at() taken before the sweep began fetching.
+    seen: rows returned per level ({"campaigns": n, ...}); a level that came
+    back empty is left alone (lost access looks the same as an empty account).
+    """
+    act = f"act_{ad_account_id}"
+    out = {"campaigns": 0, "adsets": 0, "ads": 0}
+
+    if seen.get("campaigns"):
+        out["campaigns"] = execute(
+            f"""
+            UPDATE campaigns
+            SET effective_status = 'ARCHIVED'
+            WHERE ad_account_id = %s
+              AND last_seen_at < %s
+              AND (effective_status IS NULL OR effective_status NOT IN {DEAD_STATUSES})
+            """,
+            (ad_account_id, started_at),
+        )
+
+    if seen.get("adsets"):
+        out["adsets"] = execute(
+            f"""
+            UPDATE adsets
+            SET effective_status = 'ARCHIVED'
+            WHERE ad_account_id = %s
+              AND last_seen_at < %s
+              AND (effective_status IS NULL OR effective_status NOT IN {DEAD_STATUSES})
+            """,
+            (ad_account_id, started_at),
+        )
+
+    if seen.get("ads"):
+        out["ads"] = execute(
+            f"""
+            UPDATE ads a
+            JOIN campaigns c ON c.campaign_id = a.campaign_id
+            SET a.effective_status = 'ARCHIVED'
+            WHERE c.ad_account_id = %s
+              AND a.updated_at < %s
+              AND (a.effective_status IS NULL OR a.effective_status NOT IN {DEAD_STATUSES})
+            """,
+            (ad_account_id, started_at),
+        )
+
+    if any(out.values()):
+        logger.info(
+            f"🗄️ archived missing {act} C={out['campaigns']} A={out['adsets']} D={out['ads']}"
+        )
+    return out
@@ -1,7 +1,12 @@
  # services/status_refresh_service.py
+from typing import Iterable
+
 from logs.logger import logger
 from db.db import execute
 
+# IN (...) list size per UPDATE in the incremental refresh
+ID_CHUNK = 500
+
 def refresh_ads_real_status() -> None:
     """
     OPTIONAL:
@@ -67,3 +72,79 @@ def refresh_all_real_status() -> None:
     refresh_adsets_real_status()
     refresh_campaigns_real_status()
     logger.info("🚀 refresh_all_real_status done")
+
+
+# =========================
+# INCREMENTAL (touched ids only)
+# =========================
+
+def _chunks(ids: Iterable[int]):
+    ids = sorted({int(x) for x in ids if x})
+    for i in range(0, len(ids), ID_CHUNK):
+        yield ids[i:i + ID_CHUNK]
+
+
+def refresh_adsets_real_status_for(adset_ids: Iterable[int]) -> int:
+    """Same rule as refresh_adsets_real_status, only for `adset_ids`."""
+    total = 0
+    for chunk in _chunks(adset_ids):
+        in_list = ",".join(["%s"] * len(chunk))
+        sql = f"""
+        UPDATE adsets s
+        LEFT JOIN (
+            SELECT adset_id,
+                   SUM(CASE WHEN status = 'ACTIVE' THEN 1 ELSE 0 END) AS active_ads
+            FROM ads
+            WHERE adset_id IN ({in_list})
+            GROUP BY adset_id
+        ) a ON s.adset_id = a.adset_id
+        SET s.real_status =
+            CASE
+                WHEN IFNULL(a.active_ads, 0) > 0 THEN 'ACTIVE'
+                ELSE 'PAUSED'
+            END
+        WHERE s.adset_id IN ({in_list});
+        """
+        total += execute(sql, tuple(chunk) * 2)
+    return total
+
+
+def refresh_campaigns_real_status_for(campaign_ids: Iterable[int]) -> int:
+    """Same rule as refresh_campaigns_real_status, only for `campaign_ids`."""
+    total = 0
+    for chunk in _chunks(campaign_ids):
+        in_list = ",".join(["%s"] * len(chunk))
+        sql = f"""
+        UPDATE campaigns c
+        LEFT JOIN (
+            SELECT campaign_id,
+                   SUM(CASE WHEN real_status = 'ACTIVE' THEN 1 ELSE 0 END) AS active_adsets
+            FROM adsets
+            WHERE campaign_id IN ({in_list})
+            GROUP BY campaign_id
+        ) a ON c.campaign_id = a.campaign_id
+        SET c.real_status =
+            CASE
+                WHEN IFNULL(a.active_adsets, 0) > 0 THEN 'ACTIVE'
+                ELSE 'PAUSED'
+            END
+        WHERE c.campaign_id IN ({in_list});
+        """
+        total += execute(sql, tuple(chunk) * 2)
+    return total
+
+
+def refresh_real_status_for(adset_ids: Iterable[int], campaign_ids: Iterable[int]) -> None:
+    """
+    Call after entity upserts with the ids the sync touched.
+    campaign_ids must include the parents of touched adsets (adsets first,
+    campaigns read adsets.real_status).
+    """
+    adset_ids = list(adset_ids)
+    campaign_ids = list(campaign_ids)
+    n_s = refresh_adsets_real_status_for(adset_ids)
+    n_c = refresh_campaigns_real_status_for(campaign_ids)
+    logger.info(
+        f"✅ real_status refreshed for touched ids adsets={len(adset_ids)} ({n_s} changed) "
+        f"campaigns={len(campaign_ids)} ({n_c} changed)"
+    )
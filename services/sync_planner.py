@@ -0,0 +1,58 @@
+# services/sync_planner.py
+"""
+Longest-first account scheduling from run history.
+
+Accounts are ordered by estimated cost, largest first, before they go to
+a worker pool. ThreadPoolExecutor starts queued tasks FIFO, so the largest
+accounts start first and small ones fill in around them, which shortens
+the tail. Accounts with no history are treated as largest (first run is
+usually a full sync).
+"""
+import os
+from typing import List
+
+from logs.logger import logger
+from db.repositories.account_sync_costs_repo import get_costs, record_cost
+
+# Weight of the newest run in the moving estimate
+COST_ALPHA = float(os.getenv("SYNC_COST_ALPHA", "0.3"))
+# Fallback seconds-per-unit when an account has rows/calls but no timing yet
+SECONDS_PER_API_CALL = float(os.getenv("SYNC_COST_SECONDS_PER_CALL", "1.0"))
+
+
+def _estimate(cost: dict) -> float:
+    est = float(cost.get("est_seconds") or 0)
+    if est > 0:
+        return est
+    return float(cost.get("last_api_calls") or 0) * SECONDS_PER_API_CALL
+
+
+def plan_longest_first(kind: str, accounts: List[dict]) -> List[dict]:
+    """accounts: rows with ad_account_id; returns them reordered (copy)."""
+    try:
+        costs = get_costs(kind)
+    except Exception as e:
+        logger.warning(f"⚠️ sync planner: no cost history for {kind} ({e}), keeping DB order")
+        return list(accounts)
+
+    def _key(acc):
+        cost = costs.get(int(acc["ad_account_id"]))
+        # unknown first, then by estimated seconds descending
+        return (cost is not None, -_estimate(cost) if cost else 0.0)
+
+    planned = sorted(accounts, key=_key)
+    head = [
+        f"act_{a['ad_account_id']}~{_estimate(costs[int(a['ad_account_id'])]):.0f}s"
+        if int(a["ad_account_id"]) in costs else f"act_{a['ad_account_id']}~new"
+        for a in planned[:5]
+    ]
+    logger.info(f"🗺️ {kind} plan: {len(planned)} accounts, longest first: {', '.join(head)}")
+    return planned
+
+
+def record_run(kind: str, ad_account_id: int, seconds: float, rows: int, api_calls: int) -> None:
+    """Called as each account finishes so the next plan uses fresh estimates."""
+    try:
+        record_cost(kind, ad_account_id, seconds, rows, api_calls, COST_ALPHA)
+    except Exception as e:
+        logger.warning(f"⚠️ sync planner: could not record cost act_{ad_account_id}: {e}")
@@ -0,0 +1,234 @@
+# services/task_queue_service.py
+"""
+Account-granular execution of pipeline steps through sync_tasks.
+
+    run_step_via_tasks(job_id, "entities")
+
+fans the step out into one task per account, then drains them with a
+bounded pool of claiming threads (sized like the in-process worker, via
+workers_for) while workers/task_worker.py processes on other hosts pick up
+the rest. task_worker is optional: the pipeline alone runs the step at
+the same concurrency as the in-process executor. A failed account is retried on its own
+(SYNC_TASK_MAX_ATTEMPTS); the rest of the step is unaffected.
+"""
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from logs.logger import logger
+from db.db import query_dict
+from db.config_store import get_config
+from db.repositories.sync_tasks_repo import (
+    claim_task,
+    complete_task,
+    enqueue_tasks,
+    expire_exhausted_tasks,
+    fail_task,
+    heartbeat_task,
+    reset_failed_tasks,
+    task_counts,
+)
+from integrations.meta_graph_client import MetaGraphClient
+from services.ads_service import SINGLE_PASS_CREATIVES
+from services.job_service import heartbeat
+from services.cancellation import token_for
+from services.concurrency_governor import GOVERNOR, workers_for
+from services.freshness_service import account_refreshed
+
+LEASE_SECONDS = int(os.getenv("SYNC_TASK_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("SYNC_TASK_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = int(os.getenv("SYNC_TASK_RETRY_DELAY_SECONDS", "60"))
+POLL_SECONDS = float(os.getenv("SYNC_TASK_POLL_SECONDS", "5"))
+
+# Drain pool per step: same defaults as the in-process workers
+DRAIN_WORKERS = {"entities": 2, "insights": 4, "billing": 4, "creatives": 4}
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+# =========================
+# Per-account handlers: (user_token, task) -> (ok, result)
+# =========================
+
+def _entities(user_token: str, task: dict):
+    from workers.entities_worker import _process_account
+    res = _process_account(
+        user_token, int(task["ad_account_id"]), task["portfolio_code"], task["job_id"],
+        lock_timeout=task.get("lock_timeout"),
+    )
+    return not res.get("errors"), res
+
+
+def _insights(user_token: str, task: dict):
+    # Same scheduler as the insights step: levels/slices of this account run
+    # concurrently (INSIGHTS_ACCOUNT_CONCURRENCY), each in its own governor slot
+    from workers.insights_worker import sync_accounts_insights
+    res = sync_accounts_insights(
+        user_token,
+        [{"ad_account_id": task["ad_account_id"], "portfolio_code": task["portfolio_code"]}],
+        job_id=task["job_id"],
+        days_override=task.get("insights_days"),
+    )
+    out = res["outs"][int(task["ad_account_id"])]
+    return not out["errors"], out
+
+
+def _creatives(user_token: str, task: dict):
+    from workers.creative_worker import _job
+    res = _job(user_token, int(task["ad_account_id"]), task["portfolio_code"],
+               os.getenv("CREATIVES_MODE", "incremental"), int(os.getenv("CREATIVES_DAYS", "14")),
+               token_for(task["job_id"]))
+    return not res.get("error"), res
+
+
+def _billing(user_token: str, task: dict):
+    from workers.billing_worker import _job
+    res = _job(user_token, int(task["ad_account_id"]), task["portfolio_code"] or "", token_for(task["job_id"]))
+    return bool(res.get("ok", True)) and not res.get("error"), res
+
+
+TASK_HANDLERS: Dict[str, Callable] = {
+    "entities": _entities,
+    "insights": _insights,
+    "billing": _billing,
+}
+if not SINGLE_PASS_CREATIVES:
+    # single pass: creatives come with the entities step, nothing to fan out
+    TASK_HANDLERS["creatives"] = _creatives
+
+# Handlers that take governor slots for their own inner tasks
+SELF_GOVERNED = {"insights"}
+
+
+# =========================
+# Processing
+# =========================
+
+def _keep_leased(task: dict, owner: str, stop: threading.Event) -> None:
+    while not stop.wait(max(5, LEASE_SECONDS // 3)):
+        try:
+            if not heartbeat_task(task["id"], owner, LEASE_SECONDS):
+                logger.warning(f"⚠️ lease lost task={task['id']} act_{task['ad_account_id']}")
+                return
+            heartbeat(task["job_id"])
+        except Exception as e:
+            logger.warning(f"⚠️ task heartbeat failed task={task['id']}: {e}")
+
+
+def process_task(task: dict, owner: str, user_token: Optional[str] = None) -> bool:
+    step = task["step"]
+    act = f"act_{task['ad_account_id']}"
+    user_token = user_token or get_config("META_USER_TOKEN")
+
+    stop = threading.Event()
+    hb = threading.Thread(target=_keep_leased, args=(task, owner, stop), daemon=True)
+    hb.start()
+    try:
+        if step in SELF_GOVERNED:
+            ok, result = TASK_HANDLERS[step](user_token, task)
+        else:
+            with GOVERNOR.slot(step, token_for(task["job_id"])):
+                ok, result = TASK_HANDLERS[step](user_token, task)
+        error = None if ok else str(result.get("errors") or result.get("error") or "failed")
+    except Exception as e:
+        ok, result, error = False, None, str(e)
+        logger.exception(f"🔥 task {task['id']} {step} {act} crashed")
+    finally:
+        stop.set()
+        hb.join(timeout=1)
+
+    if ok:
+        recorded = complete_task(task["id"], owner, result)
+    else:
+        recorded = fail_task(task["id"], owner, error, RETRY_DELAY_SECONDS)
+
+    if not recorded:
+        # Lease expired and another worker re-claimed the task; its outcome wins
+        logger.warning(f"⚠️ task {task['id']} {step} {act} lease lost, result discarded")
+        return False
+
+    if ok:
+        account_refreshed(task["job_id"], step, task["ad_account_id"])
+        logger.info(f"✅ task {task['id']} {step} {act} done (attempt {task['attempts']})")
+    else:
+        logger.warning(
+            f"⚠️ task {task['id']} {step} {act} failed attempt "
+            f"{task['attempts']}/{task['max_attempts']}: {error}"
+        )
+    return ok
+
+
+def _drain(job_id: int, step: str, user_token: str, token) -> None:
+    owner = worker_id()
+    while not (token and token.is_cancelled()):
+        task = claim_task(owner, LEASE_SECONDS, job_id=job_id, step=step)
+        if not task:
+            return
+        process_task(task, owner, user_token)
+        heartbeat(job_id)
+
+
+def run_step_via_tasks(job_id: int, step: str) -> dict:
+    """Pipeline step: enqueue one task per account, then drain until all are final."""
+    user_token = get_config("META_USER_TOKEN")
+    if not user_token:
+        logger.error("❌ META_USER_TOKEN missing in database 'sys_config' table")
+        return {"ok": False, "error": "Missing Token"}
+
+    accounts = query_dict("""
+        SELECT a.ad_account_id, p.code AS portfolio_code
+        FROM ad_accounts a
+        JOIN portfolios p ON p.id = a.portfolio_id
+        WHERE p.code IN ('RFM','MAGIC_EXTREME')
+        ORDER BY a.ad_account_id
+    """)
+    enqueue_tasks(job_id, step, accounts, max_attempts=MAX_ATTEMPTS)
+    # Job retry: SUCCESS tasks stay done, exhausted ones get a fresh set of attempts
+    reset_failed_tasks(job_id, step)
+    logger.info(f"📬 {step}: {len(accounts)} account tasks queued for job {job_id}")
+
+    token = token_for(job_id)
+    workers = workers_for(step, DRAIN_WORKERS.get(step, 4))
+    if step in SELF_GOVERNED:
+        # an insights task already runs up to INSIGHTS_ACCOUNT_CONCURRENCY levels at once
+        workers = max(1, workers // max(1, int(os.getenv("INSIGHTS_ACCOUNT_CONCURRENCY", "2"))))
+    while True:
+        if token and token.is_cancelled():
+            # Leave the rest queued; a resumed job drains it
+            counts = task_counts(job_id, step)
+            break
+
+        # Each thread claims until nothing is claimable right now
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = [
+                ex.submit(_drain, job_id, step, user_token, token)
+                for _ in range(workers)
+            ]
+        for f in futures:
+            f.result()
+
+        expire_exhausted_tasks()
+        counts = task_counts(job_id, step)
+        if not counts.get("PENDING") and not counts.get("RUNNING"):
+            break
+        # Remaining tasks are leased elsewhere or waiting for their retry delay
+        time.sleep(POLL_SECONDS)
+
+    ok_n = counts.get("SUCCESS", 0)
+    failed = counts.get("FAILED", 0)
+    logger.info(f"✅ {step} tasks finished job={job_id} ok={ok_n} failed={failed}")
+    if failed:
+        # Job fails -> its retry resets only the FAILED tasks (reset_failed_tasks)
+        return {
+            "ok": False,
+            "error": f"{step}: {failed} account tasks failed",
+            "success": ok_n,
+            "failed": failed,
+            "accounts": len(accounts),
+        }
+    return {"ok": True, "success": ok_n, "failed": failed, "accounts": len(accounts)}
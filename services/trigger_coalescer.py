@@ -0,0 +1,91 @@
+# services/trigger_coalescer.py
+"""
+Coalesces pipeline triggers (dashboard refreshes hitting
+/api/get_facebook_metrics, /api/run-job).
+
+  - in-memory short-circuit: a trigger within PIPELINE_TRIGGER_CACHE_SECONDS
+    of the last check in this process (or while another request is
+    checking) touches no table at all
+  - cleanup_stuck_jobs runs at most every PIPELINE_CLEANUP_INTERVAL_SECONDS
+  - one read decides "job active?" and "last job too recent?"
+    (PIPELINE_MIN_INTERVAL_SECONDS between job creations)
+  - creation itself is single-flight across processes: create_job returns
+    None when the unique active-job index rejects a second job
+"""
+import os
+import time
+from threading import Lock
+
+from logs.logger import logger
+from db.db import query_one
+from services.job_service import cleanup_stuck_jobs, create_job, update_job_status
+from services.pipeline_runner import dispatch_job
+
+MIN_INTERVAL_SECONDS = int(os.getenv("PIPELINE_MIN_INTERVAL_SECONDS", "300"))
+TRIGGER_CACHE_SECONDS = float(os.getenv("PIPELINE_TRIGGER_CACHE_SECONDS", "15"))
+CLEANUP_INTERVAL_SECONDS = float(os.getenv("PIPELINE_CLEANUP_INTERVAL_SECONDS", "60"))
+
+_LOCK = Lock()
+_CHECKED_AT = 0.0
+_CLEANED_AT = 0.0
+
+
+def _result(job_id, created: bool, reason: str) -> dict:
+    return {"job_id": job_id, "created": created, "reason": reason}
+
+
+def trigger_pipeline(include_static=None, force: bool = False) -> dict:
+    """
+    Start a pipeline job unless one is active or (force=False) one was
+    created too recently. force=True (manual run) skips the cache and the
+    minimum interval but never the single-active-job rule.
+    """
+    global _CHECKED_AT, _CLEANED_AT
+
+    now = time.monotonic()
+    if not force and now - _CHECKED_AT < TRIGGER_CACHE_SECONDS:
+        return _result(None, False, "coalesced")
+
+    if not _LOCK.acquire(blocking=force):
+        # another request in this process is deciding right now
+        return _result(None, False, "coalesced")
+
+    try:
+        _CHECKED_AT = now
+
+        if now - _CLEANED_AT >= CLEANUP_INTERVAL_SECONDS:
+            cleanup_stuck_jobs()
+            _CLEANED_AT = now
+
+        row = query_one("""
+            SELECT
+                (SELECT id FROM pipeline_jobs
+                 WHERE status IN ('RUNNING','PENDING')
+                 ORDER BY created_at DESC LIMIT 1) AS active_id,
+                TIMESTAMPDIFF(SECOND, MAX(created_at), NOW()) AS since_last
+            FROM pipeline_jobs
+        """) or {}
+
+        if row.get("active_id"):
+            return _result(row["active_id"], False, "active")
+
+        since_last = row.get("since_last")
+        if not force and since_last is not None and since_last < MIN_INTERVAL_SECONDS:
+            return _result(None, False, "min_interval")
+
+        job_id = create_job(include_static=include_static)
+        if job_id is None:
+            # another process won the insert
+            return _result(None, False, "active")
+
+        try:
+            dispatch_job({"id": job_id, "include_static": include_static})
+        except Exception as e:
+            update_job_status(job_id, "FAILED", str(e))
+            raise
+
+        logger.info(f"🆕 pipeline job {job_id} triggered")
+        return _result(job_id, True, "created")
+
+    finally:
+        _LOCK.release()
@@ -56,3 +56,13 @@ def parse_meta_datetime(value: Optional[str]) -> Optional[datetime]:
         return dt.replace(tzinfo=timezone.utc)
     except Exception:
         return None
+
+
+def max_meta_datetime(current: Optional[datetime], value: Optional[str]) -> Optional[datetime]:
+    """Running max of Meta datetime strings (e.g. updated_time high-water marks)."""
+    dt = parse_meta_datetime(value)
+    if dt is None:
+        return current
+    if current is None or dt > current:
+        return dt
+    return current
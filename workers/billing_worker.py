@@ -7,11 +7,15 @@ from integrations.meta_graph_client import MetaGraphClient
 from services.billing_service import sync_billing_for_account
 from db.config_store import get_config
 from services.job_service import heartbeat
+from db.repositories.job_progress_repo import skip_completed_accounts
+from services.freshness_service import account_refreshed
+from services.cancellation import token_for
+from services.concurrency_governor import governed, workers_for
 
-def _job(user_token: str, ad_account_id: int, portfolio_code: str) -> dict:
+def _job(user_token: str, ad_account_id: int, portfolio_code: str, cancel_token=None) -> dict:
     act = f"act_{ad_account_id}"
     # Inject client
-    client = MetaGraphClient(user_token)
+    client = MetaGraphClient(user_token, cancel_token=cancel_token)
     
     try:
         return sync_billing_for_account(
@@ -23,7 +27,7 @@ def _job(user_token: str, ad_account_id: int, portfolio_code: str) -> dict:
         logger.error(f"❌ billing thread failed {act}: {e}")
         return {"ok": False, "ad_account_id": ad_account_id, "error": str(e)}
 
-def run():
+def run(job_id=None):
 # 1. Pull token from DB instead of OS environment
     user_token = get_config("META_USER_TOKEN")
     
@@ -32,7 +36,7 @@ def run():
         # You can choose to raise an exception or return gracefully
         return {"ok": False, "error": "Missing Token"}
 
-    workers = int(os.getenv("SYNC_WORKERS", "4")) # Billing is fast, can handle more workers
+    workers = workers_for("billing", 4) # Billing is fast, can handle more workers
 
     accounts = query_dict("""
         SELECT a.ad_account_id, p.code AS portfolio_code
@@ -41,6 +45,8 @@ def run():
         WHERE p.code IN ('RFM','MAGIC_EXTREME') 
         ORDER BY a.ad_account_id
     """)
+    # Retried job: accounts already finished in this job are not redone
+    accounts = skip_completed_accounts(job_id, "billing", accounts)
 
     if not accounts:
         logger.warning("No ad accounts found for billing")
@@ -48,15 +54,19 @@ def run():
 
     ok, failed = 0, 0
     with ThreadPoolExecutor(max_workers=workers) as ex:
-        futures = [
-            ex.submit(_job, user_token, int(r["ad_account_id"]), r["portfolio_code"] or "")
+        futures = {
+            ex.submit(governed("billing", _job, token_for(job_id)), user_token, int(r["ad_account_id"]), r["portfolio_code"] or "", token_for(job_id)): int(r["ad_account_id"])
             for r in accounts
-        ]
+        }
 
         for f in as_completed(futures):
             # ❤️ HEARTBEAT: Every time a single task finishes, update the job timestamp
+            if job_id:
+                heartbeat(job_id)
             res = f.result()
-            if res.get("ok"): ok += 1
+            if res.get("ok"):
+                ok += 1
+                account_refreshed(job_id, "billing", futures[f])
             else: failed += 1
 
     logger.info(f"✅ billing DONE ok={ok} failed={failed}")
@@ -7,14 +7,20 @@ from logs.logger import logger
 from db.db import query_dict
 from integrations.meta_graph_client import MetaGraphClient
 from services.creatives_service import sync_creatives_for_account
+from services.ads_service import SINGLE_PASS_CREATIVES
 from db.config_store import get_config
 from services.job_service import heartbeat
-def _job(user_token: str, ad_account_id: int, portfolio_code: str, mode: str, days: int) -> dict:
+from db.repositories.job_progress_repo import skip_completed_accounts
+from services.freshness_service import account_refreshed
+from services.cancellation import token_for
+from services.concurrency_governor import governed, workers_for
+def _job(user_token: str, ad_account_id: int, portfolio_code: str, mode: str, days: int,
+         cancel_token=None) -> dict:
     act = f"act_{ad_account_id}"
     logger.info(f"🧵 Creative Thread start {act} portfolio={portfolio_code}")
 
     # Inject shared client
-    client = MetaGraphClient(user_token)
+    client = MetaGraphClient(user_token, cancel_token=cancel_token)
 
     out = {
         "ad_account_id": ad_account_id,
@@ -37,6 +43,12 @@ def _job(user_token: str, ad_account_id: int, portfolio_code: str, mode: str, da
     return out
 
 def run(job_id=None):
+    # Inside a pipeline job the entities step already synced creatives
+    # (sync_ads_with_creatives_for_account), so don't page act_X/ads again.
+    if job_id and SINGLE_PASS_CREATIVES:
+        logger.info("⏭️ creatives step skipped: synced in single pass with ads")
+        return {"ok": True, "skipped": "single_pass"}
+
 # 1. Pull token from DB instead of OS environment
     user_token = get_config("META_USER_TOKEN")
     
@@ -44,7 +56,7 @@ def run(job_id=None):
         logger.error("❌ META_USER_TOKEN missing in database 'sys_config' table")
         # You can choose to raise an exception or return gracefully
         return {"ok": False, "error": "Missing Token"}
-    workers = int(os.getenv("SYNC_WORKERS", "4"))
+    workers = workers_for("creatives", 4)
     days = int(os.getenv("CREATIVES_DAYS", "14")) # Suggesting 14 for incremental
     mode = os.getenv("CREATIVES_MODE", "incremental")
 
@@ -54,11 +66,13 @@ def run(job_id=None):
         JOIN portfolios p ON p.id = a.portfolio_id
         WHERE p.code IN ('RFM','MAGIC_EXTREME')
     """)
+    # Retried job: accounts already finished in this job are not redone
+    accounts = skip_completed_accounts(job_id, "creatives", accounts)
 
     ok, failed = 0, 0
     with ThreadPoolExecutor(max_workers=workers) as ex:
         futures = [
-            ex.submit(_job, user_token, int(r["ad_account_id"]), r["portfolio_code"], mode, days)
+            ex.submit(governed("creatives", _job, token_for(job_id)), user_token, int(r["ad_account_id"]), r["portfolio_code"], mode, days, token_for(job_id))
             for r in accounts
         ]
         for f in as_completed(futures):
@@ -67,7 +81,9 @@ def run(job_id=None):
                 heartbeat(job_id)
             res = f.result()
             if res.get("error"): failed += 1
-            else: ok += 1
+            else:
+                ok += 1
+                account_refreshed(job_id, "creatives", res["ad_account_id"])
 
     logger.info(f"✅ creatives worker finished ok={ok} failed={failed}")
 
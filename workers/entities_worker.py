@@ -4,35 +4,47 @@ import os
 import time
 import random
 
-from threading import Lock
+from datetime import datetime, timedelta, timezone
+
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from logs.logger import logger
 from db.db import query_dict, execute
-from integrations.meta_graph_client import MetaGraphClient
+from db.locks import LockTimeoutError, get_account_lock, start_lock_window, end_lock_window
+from integrations.meta_graph_client import MetaGraphClient, MetaPayloadTooLargeError
 
 from services.campaigns_service import sync_campaigns_for_account
 from services.adsets_service import sync_adsets_for_account
-from services.ads_service import sync_ads_for_account
+from services.ads_service import (
+    sync_ads_for_account,
+    sync_ads_with_creatives_for_account,
+    SINGLE_PASS_CREATIVES,
+)
+from services.entities_nested_service import sync_entities_nested_for_account
+from services.reconcile_service import sweep_started_at, archive_missing_entities
+from services.status_refresh_service import refresh_real_status_for
+from services.sync_planner import plan_longest_first, record_run
+from services.cancellation import JobCancelledError, token_for
+from services.concurrency_governor import governed, workers_for
+from db.repositories.job_progress_repo import skip_completed_accounts
+from services.freshness_service import account_refreshed
 
 from db.config_store import get_config
-from services.job_service import heartbeat
+from db.repositories.sync_checkpoints_repo import (
+    get_high_water,
+    set_high_water,
+    get_last_success,
+    set_last_success,
+)
+from services.job_service import heartbeat, BOOKKEEPING_ASYNC
+from services.bookkeeping_writer import WRITER
 
 
 # =========================================================
 # ACCOUNT-LEVEL LOCKS (NOT GLOBAL)
 # =========================================================
 
-account_locks = {}
-account_locks_guard = Lock()
-
-
-def get_account_lock(ad_account_id):
-    with account_locks_guard:
-        if ad_account_id not in account_locks:
-            account_locks[ad_account_id] = Lock()
-
-        return account_locks[ad_account_id]
+# get_account_lock (db/locks.py): one lock per account for the whole sync
 
 
 # =========================================================
@@ -85,6 +97,10 @@ def retry_meta(fn, retries=5):
         try:
             return fn()
 
+        except (JobCancelledError, MetaPayloadTooLargeError):
+            # Stop/deadline, or a payload that needs a smaller request: never retried
+            raise
+
         except Exception as e:
 
             msg = str(e).lower()
@@ -125,6 +141,12 @@ def log_error_to_db(job_id, step, ad_account_id, error_message):
     if not job_id:
         return
 
+    if BOOKKEEPING_ASYNC:
+
+        WRITER.log(job_id, f"{step}:act_{ad_account_id}", "FAILED", error_message[:1000])
+
+        return
+
     try:
 
         execute(
@@ -156,11 +178,182 @@ def log_error_to_db(job_id, step, ad_account_id, error_message):
         logger.error(f"⚠️ Failed to write log to DB: {e}")
 
 
+# =========================================================
+# FETCH STRATEGY (nested vs flat)
+# =========================================================
+
+# auto | nested | flat
+ENTITIES_FETCH = os.getenv("ENTITIES_FETCH", "auto").lower()
+ENTITIES_NESTED_MAX_ADS = int(os.getenv("ENTITIES_NESTED_MAX_ADS", "1500"))
+
+
+def _use_nested(ad_account_id):
+
+    if ENTITIES_FETCH == "nested":
+        return True
+
+    if ENTITIES_FETCH != "auto":
+        return False
+
+    rows = query_dict(
+        """
+        SELECT COUNT(*) AS n
+        FROM ads a
+        JOIN campaigns c
+            ON c.campaign_id = a.campaign_id
+        WHERE c.ad_account_id=%(id)s
+        """,
+        {"id": ad_account_id},
+    )
+
+    n = int(rows[0]["n"]) if rows else 0
+
+    return n < ENTITIES_NESTED_MAX_ADS
+
+
+# =========================================================
+# CHECKPOINTS (updated_time high-water marks + weekly sweep)
+# =========================================================
+
+# Re-read a little before the mark: Meta's updated_time is second-resolution
+# and objects can land slightly out of order.
+HWM_OVERLAP = timedelta(minutes=int(os.getenv("ENTITIES_HWM_OVERLAP_MINUTES", "15")))
+FULL_SWEEP_DAYS = int(os.getenv("ENTITIES_FULL_SWEEP_DAYS", "7"))
+FULL_SWEEP_ENTITY = "entities_full_sweep"
+
+
+def _updated_since(entity, ad_account_id):
+
+    hwm = get_high_water(entity, str(ad_account_id))
+
+    return hwm - HWM_OVERLAP if hwm else None
+
+
+def _full_sweep_due(ad_account_id):
+
+    last = get_last_success(FULL_SWEEP_ENTITY, str(ad_account_id))
+
+    if not last:
+        return True
+
+    last_dt = datetime.fromisoformat(last).replace(tzinfo=timezone.utc)
+
+    return datetime.now(timezone.utc) - last_dt >= timedelta(days=FULL_SWEEP_DAYS)
+
+
+def _save_high_water(entity, ad_account_id, res):
+
+    if isinstance(res, dict):
+        set_high_water(entity, str(ad_account_id), res.get("max_updated_time"))
+
+
+def _finish_full_sweep(ad_account_id, started_at, result):
+
+    # Archival is only safe when every level walked its whole traversal;
+    # a partial one would "archive" everything on the pages it never saw
+    incomplete = [
+        entity for entity in ("campaigns", "adsets", "ads")
+        if not (result.get(entity) or {}).get("complete")
+    ]
+
+    if result["errors"] or incomplete:
+
+        logger.warning(
+            f"⚠️ act_{ad_account_id} full sweep incomplete {incomplete or result['errors']}, "
+            f"archival skipped"
+        )
+
+        return
+
+    set_last_success(FULL_SWEEP_ENTITY, str(ad_account_id))
+
+    # Anything not stamped since started_at is gone from Graph
+    try:
+        result["archived"] = archive_missing_entities(
+            ad_account_id,
+            started_at,
+            {
+                entity: result[entity].get("saved", 0)
+                for entity in ("campaigns", "adsets", "ads")
+            }
+        )
+
+    except Exception as e:
+
+        logger.warning(f"⚠️ act_{ad_account_id} archival reconcile failed: {e}")
+
+
+def _refresh_touched_status(ad_account_id, result):
+
+    # Only the adsets/campaigns this run wrote (or whose ads it wrote)
+    adset_ids = set()
+    campaign_ids = set()
+
+    for entity in ("campaigns", "adsets", "ads"):
+        data = result.get(entity) or {}
+        adset_ids |= data.pop("touched_adsets", set())
+        campaign_ids |= data.pop("touched_campaigns", set())
+
+    if not adset_ids and not campaign_ids:
+        return
+
+    try:
+        refresh_real_status_for(adset_ids, campaign_ids)
+
+    except Exception as e:
+
+        logger.warning(f"⚠️ act_{ad_account_id} real_status refresh failed: {e}")
+
+
+def _log_done(act, result):
+
+    logger.info(
+        f"🧵 DONE {act} | "
+        f"C={result['campaigns'].get('saved',0)} "
+        f"A={result['adsets'].get('saved',0)} "
+        f"D={result['ads'].get('saved',0)}"
+    )
+
+
 # =========================================================
 # ACCOUNT WORKER
 # =========================================================
 
 def _process_account(
+    user_token: str,
+    ad_account_id: int,
+    portfolio_code: str,
+    job_id=None,
+    lock_timeout=None
+):
+
+    # One lock for the whole account: campaigns, adsets, ads, status refresh
+    # and archival never overlap with another thread/host on the same account
+    try:
+
+        with get_account_lock(ad_account_id, timeout=lock_timeout):
+
+            return _sync_account(user_token, ad_account_id, portfolio_code, job_id)
+
+    except LockTimeoutError as e:
+
+        logger.warning(f"⏳ act_{ad_account_id} busy elsewhere: {e}")
+
+        log_error_to_db(job_id, "AccountLock", ad_account_id, str(e))
+
+        return {
+            "ad_account_id": ad_account_id,
+            "portfolio_code": portfolio_code,
+            "campaigns": {"saved": 0},
+            "adsets": {"saved": 0},
+            "ads": {"saved": 0},
+            "errors": [f"Account lock timeout: {e}"],
+            "seconds": 0,
+            "api_calls": 0,
+        }
+
+
+def _sync_account(
     user_token: str,
     ad_account_id: int,
     portfolio_code: str,
@@ -171,7 +364,11 @@ def _process_account(
 
     logger.info(f"🧵 START {act} portfolio={portfolio_code}")
 
-    client = MetaGraphClient(user_token)
+    token = token_for(job_id)
+
+    client = MetaGraphClient(user_token, cancel_token=token)
+
+    started = time.monotonic()
 
     result = {
         "ad_account_id": ad_account_id,
@@ -184,6 +381,13 @@ def _process_account(
 
     try:
 
+        if token and token.is_cancelled():
+
+            # Queued before the stop: don't start, and don't count as done
+            result["errors"].append(f"cancelled: {token.reason}")
+
+            return result
+
         has_campaigns = query_dict(
             """
             SELECT 1
@@ -196,29 +400,96 @@ def _process_account(
 
         first_time = not bool(has_campaigns)
 
-        mode = "full" if first_time else "incremental"
+        # Weekly full sweep catches anything the high-water marks missed
+        mode = "full" if first_time or _full_sweep_due(ad_account_id) else "incremental"
 
         sync_days = 90 if first_time else 14
 
+        started_at = sweep_started_at() if mode == "full" else None
+
         # =====================================================
-        # CAMPAIGNS
+        # NESTED (small accounts, full sweeps only: one traversal
+        # for all three; incremental runs use the flat path below
+        # so the updated_time high-water marks still apply)
         # =====================================================
 
-        try:
+        if mode == "full" and _use_nested(ad_account_id):
 
-            with get_account_lock(ad_account_id):
+            try:
 
-                result["campaigns"] = retry_deadlock(
+                # retry_meta re-raises MetaPayloadTooLargeError -> flat fallback below
+                nested = retry_deadlock(
                     lambda: retry_meta(
-                        lambda: sync_campaigns_for_account(
+                        lambda: sync_entities_nested_for_account(
                             client=client,
-                            ad_account_id=ad_account_id,
-                            mode=mode,
-                            days=sync_days
+                            ad_account_id=ad_account_id
                         )
                     )
                 )
 
+                result.update(nested)
+
+                # Nested is always a full fetch
+                for entity in ("campaigns", "adsets", "ads"):
+                    _save_high_water(entity, ad_account_id, nested.get(entity))
+
+                _finish_full_sweep(ad_account_id, started_at, result)
+
+                _refresh_touched_status(ad_account_id, result)
+
+                _log_done(act, result)
+
+                return result
+
+            except MetaPayloadTooLargeError as e:
+
+                # Account outgrew the nested payload -> flat traversal below
+                logger.warning(f"⚠️ {act} nested fetch too large, falling back to flat: {e}")
+
+            except Exception as e:
+
+                err = f"Nested entities failed: {e}"
+
+                logger.exception(f"🔥 {act} {err}")
+
+                result["errors"].append(err)
+
+                log_error_to_db(
+                    job_id,
+                    "Entities",
+                    ad_account_id,
+                    str(e)
+                )
+
+                return result
+
+        # Incremental: strictly after the stored updated_time mark (minus overlap);
+        # no mark yet -> the old `sync_days` cutoff
+        since = {
+            entity: (_updated_since(entity, ad_account_id) if mode == "incremental" else None)
+            for entity in ("campaigns", "adsets", "ads")
+        }
+
+        # =====================================================
+        # CAMPAIGNS
+        # =====================================================
+
+        try:
+
+            result["campaigns"] = retry_deadlock(
+                lambda: retry_meta(
+                    lambda: sync_campaigns_for_account(
+                        client=client,
+                        ad_account_id=ad_account_id,
+                        mode=mode,
+                        days=sync_days,
+                        updated_since=since["campaigns"]
+                    )
+                )
+            )
+
+            _save_high_water("campaigns", ad_account_id, result["campaigns"])
+
         except Exception as e:
 
             err = f"Campaigns failed: {e}"
@@ -248,11 +519,14 @@ def _process_account(
                         client=client,
                         ad_account_id=ad_account_id,
                         mode=mode,
-                        days=sync_days
+                        days=sync_days,
+                        updated_since=since["adsets"]
                     )
                 )
             )
 
+            _save_high_water("adsets", ad_account_id, result["adsets"])
+
         except Exception as e:
 
             err = f"Adsets failed: {e}"
@@ -276,17 +550,32 @@ def _process_account(
 
         try:
 
+            # Single pass also fills creative_ads + ads.creative_id
+            sync_ads = (
+                sync_ads_with_creatives_for_account
+                if SINGLE_PASS_CREATIVES
+                else sync_ads_for_account
+            )
+
             result["ads"] = retry_deadlock(
                 lambda: retry_meta(
-                    lambda: sync_ads_for_account(
+                    lambda: sync_ads(
                         client=client,
                         ad_account_id=ad_account_id,
                         mode=mode,
-                        days=sync_days
+                        days=sync_days,
+                        updated_since=since["ads"]
                     )
                 )
             )
 
+            _save_high_water("ads", ad_account_id, result["ads"])
+
+            if mode == "full":
+                _finish_full_sweep(ad_account_id, started_at, result)
+
+            _refresh_touched_status(ad_account_id, result)
+
         except Exception as e:
 
             err = f"Ads failed: {e}"
@@ -319,12 +608,13 @@ def _process_account(
             msg
         )
 
-    logger.info(
-        f"🧵 DONE {act} | "
-        f"C={result['campaigns'].get('saved',0)} "
-        f"A={result['adsets'].get('saved',0)} "
-        f"D={result['ads'].get('saved',0)}"
-    )
+    finally:
+
+        # Every return path: inputs for the cost-based planner
+        result["seconds"] = time.monotonic() - started
+        result["api_calls"] = client.calls
+
+    _log_done(act, result)
 
     return result
 
@@ -346,7 +636,9 @@ def run(job_id=None):
             "error": "Missing Token"
         }
 
-    max_workers = int(os.getenv("SYNC_WORKERS", "2"))
+    max_workers = workers_for("entities", 2)
+
+    lock_window = start_lock_window()
 
     accounts = query_dict(
         """
@@ -360,6 +652,9 @@ def run(job_id=None):
         """
     )
 
+    # Retried job: accounts already finished in this job are not redone
+    accounts = skip_completed_accounts(job_id, "entities", accounts)
+
     total_synced = 0
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -367,14 +662,15 @@ def run(job_id=None):
         future_to_acc = {
 
             executor.submit(
-                _process_account,
+                governed("entities", _process_account, token_for(job_id)),
                 user_token,
                 acc["ad_account_id"],
                 acc["portfolio_code"],
                 job_id
             ): acc
 
-            for acc in accounts
+            # Longest-first: big accounts start early instead of dominating the tail
+            for acc in plan_longest_first("entities", accounts)
         }
 
         for future in as_completed(future_to_acc):
@@ -388,13 +684,32 @@ def run(job_id=None):
 
                 res = future.result()
 
+                rows = 0
+
                 for level in ["campaigns", "adsets", "ads"]:
 
                     data = res.get(level)
 
                     if isinstance(data, dict):
 
-                        total_synced += data.get("saved", 0)
+                        rows += data.get("saved", 0)
+
+                total_synced += rows
+
+                if not res.get("errors"):
+
+                    # Only complete, timed runs feed the cost EWMA: lock timeouts,
+                    # cancellations and errors would pull the estimate toward 0
+                    if res.get("seconds"):
+                        record_run(
+                            "entities",
+                            int(acc_info["ad_account_id"]),
+                            res["seconds"],
+                            rows,
+                            res.get("api_calls", 0)
+                        )
+
+                    account_refreshed(job_id, "entities", acc_info["ad_account_id"])
 
             except Exception as e:
 
@@ -412,12 +727,20 @@ def run(job_id=None):
                     err_msg
                 )
 
+    # This run's lock numbers only (metrics are process-wide in the daemon)
+    locks = end_lock_window(lock_window)
+
     logger.info(
         f"🚀 FINISHED. "
-        f"Total entities saved: {total_synced}"
+        f"Total entities saved: {total_synced} "
+        f"locks={locks['acquired']:.0f} "
+        f"lock_wait={locks['wait_seconds_total']:.1f}s "
+        f"lock_wait_max={locks['wait_seconds_max']:.1f}s "
+        f"lock_timeouts={locks['timeouts']:.0f}"
     )
 
     return {
         "ok": True,
-        "total_saved": total_synced
+        "total_saved": total_synced,
+        "locks": locks
     }
\ No newline at end of file
@@ -1,6 +1,8 @@
 #insights_worker
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from integrations.meta_graph_client import MetaGraphClient
 
 from logs.logger import logger
@@ -10,70 +12,205 @@ from services.insights_service import (
     sync_campaign_daily_insights_for_account,
     sync_adset_daily_insights_for_account,
     sync_ad_daily_insights_for_account,
+    sync_account_daily_insights_for_account,
+    sync_account_window_reach_for_account,
 )
 from services.job_service import heartbeat
-
-
-def _job_for_account(user_token: str, ad_account_id: int, portfolio_code: str, days: int) -> dict:
-    act = f"act_{ad_account_id}"
-    logger.info(f"🧵 Insights Thread start {act} portfolio={portfolio_code} days={days}")
-    out = {
-        "ad_account_id": ad_account_id,
-        "portfolio_code": portfolio_code,
-        "campaigns": None,
-        "adsets": None,
-        "ads": None,
-        "errors": [],
-    }
-    client = MetaGraphClient(user_token)
+from services.activity_service import insights_days
+from db.repositories.job_progress_repo import skip_completed_accounts
+from services.freshness_service import account_refreshed
+from services.cancellation import token_for
+from services.concurrency_governor import governed, workers_for
+
+
+# level -> (result key, service function)
+LEVELS = [
+    ("campaign", "campaigns", sync_campaign_daily_insights_for_account),
+    ("adset", "adsets", sync_adset_daily_insights_for_account),
+    ("ad", "ads", sync_ad_daily_insights_for_account),
+    ("account", "account", sync_account_daily_insights_for_account),
+    # one request per account, never sliced (reach is de-duplicated per request)
+    ("account_window", "account_reach", sync_account_window_reach_for_account),
+]
+UNSLICED_LEVELS = {"account_window"}
+
+
+def _time_slices(days: int, slice_days: int) -> list:
+    """
+    Split the last `days` days into (since, until) windows of `slice_days`.
+    slice_days <= 0 (or >= days) keeps a single date_preset request: [(None, None)].
+    """
+    if slice_days <= 0 or slice_days >= days:
+        return [(None, None)]
+
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=days)
+    slices = []
+    while start < today:
+        end = min(start + timedelta(days=slice_days - 1), today - timedelta(days=1))
+        slices.append((start.isoformat(), end.isoformat()))
+        start = end + timedelta(days=1)
+    return slices
+
+
+def _level_task(client: MetaGraphClient, ad_account_id: int, portfolio_code: str,
+                level: str, func, days: int, since, until) -> dict:
     try:
-        out["campaigns"] = sync_campaign_daily_insights_for_account(
-            client=client, 
+        return func(
+            client=client,
             ad_account_id=ad_account_id,
             portfolio_code=portfolio_code,
             days=days,
+            since=since,
+            until=until,
         )
-        if isinstance(out["campaigns"], dict) and out["campaigns"].get("error"):
-            out["errors"].append(out["campaigns"]["error"])
-
-        out["adsets"] = sync_adset_daily_insights_for_account(
-            client=client, 
-            ad_account_id=ad_account_id,
-            portfolio_code=portfolio_code,
-            days=days,
+    except Exception as e:
+        logger.error(f"❌ insights task crashed act_{ad_account_id} level={level}: {e}")
+        return {"saved": 0, "skipped": 0, "error": str(e)}
+
+
+def _merge_result(out: dict, key: str, res) -> None:
+    if not isinstance(res, dict):
+        return
+    cur = out[key] or {"saved": 0, "skipped": 0}
+    cur["saved"] = cur.get("saved", 0) + res.get("saved", 0)
+    cur["skipped"] = cur.get("skipped", 0) + res.get("skipped", 0)
+    if res.get("error"):
+        cur["error"] = res["error"]
+        out["errors"].append(res["error"])
+    out[key] = cur
+
+
+def sync_accounts_insights(user_token: str, accounts: list, job_id=None,
+                           max_workers: int = None, days_override: int = None) -> dict:
+    """
+    Level/slice tasks of `accounts` (rows with ad_account_id, portfolio_code)
+    on one pool: round-robin across accounts, at most INSIGHTS_ACCOUNT_CONCURRENCY
+    in flight per account, every task inside a governor slot.
+    Used by run() and by the sync_tasks handler (one account per task).
+    days_override replaces the (activity-weighted) INSIGHTS_DAYS lookback.
+    """
+    max_workers = max_workers or workers_for("insights", 4)
+    days = int(os.getenv("INSIGHTS_DAYS", "30"))
+    # Max in-flight Graph tasks for ONE account (shared by its levels + slices)
+    per_account = max(1, int(os.getenv("INSIGHTS_ACCOUNT_CONCURRENCY", "2")))
+    slice_days = int(os.getenv("INSIGHTS_SLICE_DAYS", "0"))
+    token = token_for(job_id)
+
+    # Lookback scales with account activity (dormant -> short probe window)
+    weighted = os.getenv("ACTIVITY_WEIGHTING", "1") == "1"
+
+    # One queue of (level, slice) tasks per account, plus its aggregated result
+    queues = {}
+    outs = {}
+    clients = {}
+    in_flight = {}
+    acc_days = {}
+    for r in accounts:
+        acc_id = int(r["ad_account_id"])
+        if days_override:
+            acc_days[acc_id] = int(days_override)
+        else:
+            acc_days[acc_id] = insights_days(acc_id, days) if weighted else days
+        slices = _time_slices(acc_days[acc_id], slice_days)
+        queues[acc_id] = deque(
+            (level, key, func, since, until)
+            for level, key, func in LEVELS
+            for since, until in ([(None, None)] if level in UNSLICED_LEVELS else slices)
         )
-        if isinstance(out["adsets"], dict) and out["adsets"].get("error"):
-            out["errors"].append(out["adsets"]["error"])
+        outs[acc_id] = {
+            "ad_account_id": acc_id,
+            "portfolio_code": r["portfolio_code"],
+            "campaigns": None,
+            "adsets": None,
+            "ads": None,
+            "account": None,
+            "account_reach": None,
+            "errors": [],
+        }
+        clients[acc_id] = MetaGraphClient(user_token, cancel_token=token)
+        in_flight[acc_id] = 0
 
-        out["ads"] = sync_ad_daily_insights_for_account(
-            client=client, 
-            ad_account_id=ad_account_id,
-            portfolio_code=portfolio_code,
-            days=days,
-        )
-        if isinstance(out["ads"], dict) and out["ads"].get("error"):
-            out["errors"].append(out["ads"]["error"])
-    except Exception as e:
-        # The thread for THIS account stops here and doesn't try adsets or ads.
-        logger.error(f"❌ insights thread crashed: {e}")
-    logger.info(f"🧵 Insights Thread done {act} errors={len(out['errors'])}")
-    return out
+    ok = 0
+    failed = 0
+    futures = {}
+
+    def _fill(ex):
+        if token and token.is_cancelled():
+            # Nothing new starts; running tasks stop at their next page
+            for acc_id, q in queues.items():
+                if q:
+                    q.clear()
+                    outs[acc_id]["errors"].append(f"cancelled: {token.reason}")
+            return
+
+        # Round-robin over accounts so a huge account can't hog every thread
+        progressed = True
+        while progressed and len(futures) < max_workers:
+            progressed = False
+            for acc_id, q in queues.items():
+                if len(futures) >= max_workers:
+                    break
+                if not q or in_flight[acc_id] >= per_account:
+                    continue
+                level, key, func, since, until = q.popleft()
+                # Reach window stays INSIGHTS_DAYS for every account (comparable column)
+                d = days if level in UNSLICED_LEVELS else acc_days[acc_id]
+                f = ex.submit(
+                    governed("insights", _level_task, token), clients[acc_id], acc_id,
+                    outs[acc_id]["portfolio_code"], level, func, d, since, until,
+                )
+                futures[f] = (acc_id, key)
+                in_flight[acc_id] += 1
+                progressed = True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        _fill(ex)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+            for f in done:
+                acc_id, key = futures.pop(f)
+                in_flight[acc_id] -= 1
+                _merge_result(outs[acc_id], key, f.result())
+
+                # Account finished: nothing queued and nothing running
+                if not queues[acc_id] and in_flight[acc_id] == 0:
+                    # ❤️ HEARTBEAT: Update the job timestamp every time an account finishes
+                    if job_id:
+                        heartbeat(job_id)
+                    res = outs[acc_id]
+                    logger.info(f"📦 INSIGHTS RESULT: {res}")
+                    if res.get("errors"):
+                        failed += 1
+                    else:
+                        ok += 1
+                        account_refreshed(job_id, "insights", acc_id)
+
+            _fill(ex)
+
+    return {"outs": outs, "success": ok, "failed": failed}
 
 
 # ✅ REQUIRED BY PIPELINE
 def run(job_id=None):
 # 1. Pull token from DB instead of OS environment
     user_token = get_config("META_USER_TOKEN")
-    
+
     if not user_token:
         logger.error("❌ META_USER_TOKEN missing in database 'sys_config' table")
         # You can choose to raise an exception or return gracefully
         return {"ok": False, "error": "Missing Token"}
 
-    max_workers = int(os.getenv("SYNC_WORKERS", "4"))
-    days = int(os.getenv("INSIGHTS_DAYS", "30"))
+    max_workers = workers_for("insights", 4)
 
-    logger.info(f"🚀 insights worker starting workers={max_workers} days={days}")
+    logger.info(
+        f"🚀 insights worker starting workers={max_workers} "
+        f"days={os.getenv('INSIGHTS_DAYS', '30')} "
+        f"per_account={os.getenv('INSIGHTS_ACCOUNT_CONCURRENCY', '2')} "
+        f"slice_days={os.getenv('INSIGHTS_SLICE_DAYS', '0')}"
+    )
 
     accounts = query_dict("""
         SELECT a.ad_account_id, p.code AS portfolio_code
@@ -82,35 +219,15 @@ def run(job_id=None):
         WHERE p.code IN ('RFM','MAGIC_EXTREME')
         ORDER BY p.code, a.ad_account_id
     """)
+    # Retried job: accounts already finished in this job are not redone
+    accounts = skip_completed_accounts(job_id, "insights", accounts)
+
     if not accounts:
         logger.warning("No ad accounts found")
         return {"ok": True, "accounts": 0}
 
-    ok = 0
-    failed = 0
-
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = [
-            ex.submit(_job_for_account, user_token, int(r["ad_account_id"]), r["portfolio_code"], days)
-            for r in accounts
-        ]
-   #     import pdb; pdb.set_trace()
-
-        for f in as_completed(futures):
-            # ❤️ HEARTBEAT: Update the job timestamp every time a thread finishes an account
-            if job_id:
-                heartbeat(job_id)
-            try:
-                res = f.result()
-                logger.info(f"📦 INSIGHTS RESULT: {res}")
-                if res.get("errors"):
-                    failed += 1
-                else:
-                    ok += 1
-                    
-            except Exception as e:
-                failed += 1
-                logger.error(f"❌ insights thread crashed: {e}")
+    res = sync_accounts_insights(user_token, accounts, job_id=job_id, max_workers=max_workers)
+    ok, failed = res["success"], res["failed"]
 
     logger.info(f"✅ insights worker finished ok={ok} failed={failed}")
 
@@ -123,4 +240,4 @@ def run(job_id=None):
 
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    run()
@@ -0,0 +1,90 @@
+# intraday_worker.py
+"""
+Hourly spend stream for today, on its own cadence:
+
+    python -m workers.intraday_worker          # loop every INTRADAY_INTERVAL_SECONDS
+    INTRADAY_ONCE=1 python -m workers.intraday_worker
+
+Not part of run_pipeline_job; the heavy daily sync stays as it is.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from logs.logger import logger
+from db.db import query_dict
+from db.config_store import get_config
+from integrations.meta_graph_client import MetaGraphClient
+from services.intraday_insights_service import sync_ad_hourly_insights_for_account
+from db.repositories.ad_hourly_insights_repo import purge_ad_hourly_insights
+
+
+def _job(user_token: str, ad_account_id: int) -> dict:
+    client = MetaGraphClient(user_token)
+    try:
+        return sync_ad_hourly_insights_for_account(client, ad_account_id)
+    except Exception as e:
+        logger.error(f"❌ intraday thread failed act_{ad_account_id}: {e}")
+        return {"saved": 0, "error": str(e)}
+
+
+def run(job_id=None):
+    user_token = get_config("META_USER_TOKEN")
+
+    if not user_token:
+        logger.error("❌ META_USER_TOKEN missing in database 'sys_config' table")
+        return {"ok": False, "error": "Missing Token"}
+
+    workers = int(os.getenv("INTRADAY_WORKERS", "4"))
+
+    # Only accounts that have something delivering right now
+    accounts = query_dict("""
+        SELECT DISTINCT a.ad_account_id
+        FROM ad_accounts a
+        JOIN portfolios p ON p.id = a.portfolio_id
+        JOIN campaigns c ON c.ad_account_id = a.ad_account_id
+        WHERE p.code IN ('RFM','MAGIC_EXTREME')
+          AND c.effective_status = 'ACTIVE'
+        ORDER BY a.ad_account_id
+    """)
+
+    if not accounts:
+        logger.warning("No active ad accounts for intraday insights")
+        return {"ok": True, "accounts": 0}
+
+    ok, failed, saved = 0, 0, 0
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = [
+            ex.submit(_job, user_token, int(r["ad_account_id"]))
+            for r in accounts
+        ]
+        for f in as_completed(futures):
+            res = f.result()
+            saved += res.get("saved", 0)
+            if res.get("error"): failed += 1
+            else: ok += 1
+
+    logger.info(f"✅ intraday DONE ok={ok} failed={failed} rows={saved}")
+    return {"ok": True, "success": ok, "failed": failed, "rows": saved}
+
+
+def run_forever():
+    interval = int(os.getenv("INTRADAY_INTERVAL_SECONDS", "900"))
+    keep_days = int(os.getenv("INTRADAY_KEEP_DAYS", "7"))
+
+    logger.info(f"🚀 intraday loop starting interval={interval}s")
+    while True:
+        started = time.time()
+        try:
+            run()
+            purge_ad_hourly_insights(keep_days)
+        except Exception as e:
+            logger.error(f"❌ intraday cycle crashed: {e}")
+        time.sleep(max(0, interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    if os.getenv("INTRADAY_ONCE"):
+        run()
+    else:
+        run_forever()
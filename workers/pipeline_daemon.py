@@ -0,0 +1,126 @@
+# pipeline_daemon.py
+"""
+Standalone pipeline runner; the API only enqueues (PENDING rows):
+
+    python -m workers.pipeline_daemon
+
+Run it on one or more hosts. Only the leader - whoever holds the MySQL
+named lock PIPELINE_LEADER_LOCK - dequeues; the others wait in GET_LOCK and
+take over when the leader's session ends (crash, restart, network loss).
+
+The leader claims the oldest PENDING job (PENDING -> RUNNING, conditional
+UPDATE) and runs it in this process, so a web restart no longer kills a job.
+It wakes early on a UDP datagram from services.job_service.notify_daemon,
+otherwise polls every PIPELINE_DAEMON_POLL_SECONDS. The DB pool and the
+Graph keep-alive sessions stay warm between jobs.
+"""
+import os
+import select
+import socket
+import time
+from typing import Optional
+
+from logs.logger import logger
+from db.locks import MySQLNamedLock, LockTimeoutError
+from db.migrations import run_migrations
+from services.job_service import (
+    PIPELINE_DAEMON_WAKE_PORT,
+    claim_pending_job,
+    get_pending_jobs,
+)
+from services.pipeline_runner import run_pipeline_job
+
+PIPELINE_LEADER_LOCK = "meta_pipeline_daemon_leader"
+POLL_SECONDS = float(os.getenv("PIPELINE_DAEMON_POLL_SECONDS", "5"))
+# How long a standby blocks in GET_LOCK before looping
+LEADER_WAIT_SECONDS = int(os.getenv("PIPELINE_LEADER_WAIT_SECONDS", "30"))
+
+
+def _open_wakeup() -> Optional[socket.socket]:
+    if not PIPELINE_DAEMON_WAKE_PORT:
+        return None
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.bind(("127.0.0.1", PIPELINE_DAEMON_WAKE_PORT))
+    except OSError as e:
+        s.close()
+        logger.warning(f"⚠️ wakeup port {PIPELINE_DAEMON_WAKE_PORT} unavailable ({e}), polling only")
+        return None
+    s.setblocking(False)
+    return s
+
+
+def _wait(wake: Optional[socket.socket]) -> None:
+    if wake is None:
+        time.sleep(POLL_SECONDS)
+        return
+    ready, _, _ = select.select([wake], [], [], POLL_SECONDS)
+    if ready:
+        # drain: a burst of triggers is one wakeup
+        try:
+            while True:
+                wake.recv(64)
+        except BlockingIOError:
+            pass
+
+
+def _become_leader() -> Optional[MySQLNamedLock]:
+    lock = MySQLNamedLock(PIPELINE_LEADER_LOCK, timeout=LEADER_WAIT_SECONDS)
+    try:
+        lock.acquire()
+    except LockTimeoutError:
+        return None
+    logger.info("👑 pipeline daemon is leader")
+    return lock
+
+
+def _run_next() -> bool:
+    jobs = get_pending_jobs(1)
+    if not jobs:
+        return False
+    job = jobs[0]
+    if not claim_pending_job(job["id"]):
+        # cleaned up / stopped between select and claim
+        return True
+    logger.info(f"▶️ daemon running job {job['id']}")
+    run_pipeline_job(job)
+    return True
+
+
+def run_forever():
+    logger.info(f"🚀 pipeline daemon starting poll={POLL_SECONDS}s wake_port={PIPELINE_DAEMON_WAKE_PORT}")
+    # Schema/indexes once up front, not from the sync threads
+    run_migrations()
+    lock = None
+    wake = None
+
+    while True:
+        try:
+            if lock is None:
+                lock = _become_leader()
+                if lock is None:
+                    continue
+                wake = _open_wakeup()
+
+            # Also keeps the idle lock session from timing out
+            if not lock.is_held():
+                logger.warning("⚠️ pipeline daemon lost leadership")
+                lock.release()
+                lock = None
+                if wake:
+                    wake.close()
+                    wake = None
+                continue
+
+            if _run_next():
+                continue
+        except Exception as e:
+            logger.error(f"❌ pipeline daemon loop error: {e}")
+            time.sleep(POLL_SECONDS)
+            continue
+
+        _wait(wake)
+
+
+if __name__ == "__main__":
+    run_forever()
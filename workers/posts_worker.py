@@ -11,6 +11,7 @@ from services.pages_posts_service import (
     sync_instagram_posts_last_hours,
 )
 from db.config_store import get_config
+from services.concurrency_governor import governed, workers_for
 def _job(user_token: str, page: dict, hours: int) -> dict:
     page_id = int(page["page_id"])
     page_token = page.get("page_access_token")
@@ -59,7 +60,7 @@ def run(job_id=None):
         # You can choose to raise an exception or return gracefully
         return {"ok": False, "error": "Missing Token"}
     hours = int(os.getenv("POSTS_HOURS", "48"))
-    workers = int(os.getenv("SYNC_WORKERS", "4")) # Lighter requests allow more workers
+    workers = workers_for("posts", 4) # Lighter requests allow more workers
 
     pages = query_dict("SELECT page_id, page_access_token, ig_user_id FROM pages")
 
@@ -67,7 +68,7 @@ def run(job_id=None):
 
     ok, failed = 0, 0
     with ThreadPoolExecutor(max_workers=workers) as ex:
-        futures = [ex.submit(_job, user_token, p, hours) for p in pages]
+        futures = [ex.submit(governed("posts", _job), user_token, p, hours) for p in pages]
         for f in as_completed(futures):
             # ❤️ HEARTBEAT: Update the job timestamp every time a thread finishes an account
             if job_id:
@@ -0,0 +1,112 @@
+# scheduler_worker.py
+"""
+Long-running staleness-driven scheduler:
+
+    python -m workers.scheduler_worker
+
+Every tick it ranks (entity, account) pairs by how far past their target
+staleness they are (services/freshness_service.py) and keeps SCHED_WORKERS
+slots busy with the most overdue ones. Nothing is refreshed before its
+target, so hot data stays fresh without repeated full refreshes. Per-account
+targets are stretched for low-activity accounts (services/activity_service.py).
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from logs.logger import logger
+from db.migrations import run_migrations
+from db.db import query_dict
+from db.config_store import get_config
+from services.freshness_service import load_targets, mark_fresh, stale_items
+from services.activity_service import cadence_multiplier
+from services.task_queue_service import TASK_HANDLERS
+from db.locks import LockTimeoutError, get_account_lock
+
+# Don't park a scheduler slot behind a pipeline run holding the account
+SCHED_LOCK_TIMEOUT_SECONDS = int(os.getenv("SCHED_LOCK_TIMEOUT_SECONDS", "5"))
+from workers import pages_worker
+
+
+def _refresh(user_token, entity, scope, acc):
+    if entity == "pages":
+        res = pages_worker.run()
+        ok = not (isinstance(res, dict) and res.get("ok") is False)
+    else:
+        task = {
+            "ad_account_id": int(acc["ad_account_id"]),
+            "portfolio_code": acc.get("portfolio_code"),
+            "job_id": None,
+        }
+        try:
+            if entity == "entities":
+                # _process_account takes the account lock itself
+                task["lock_timeout"] = SCHED_LOCK_TIMEOUT_SECONDS
+                ok, res = TASK_HANDLERS[entity](user_token, task)
+            else:
+                with get_account_lock(task["ad_account_id"], timeout=SCHED_LOCK_TIMEOUT_SECONDS):
+                    ok, res = TASK_HANDLERS[entity](user_token, task)
+        except LockTimeoutError:
+            logger.info(f"⏳ scheduler: {entity} scope={scope} busy (pipeline?), next tick")
+            return False
+
+    if ok:
+        mark_fresh(entity, scope)
+    else:
+        logger.warning(f"⚠️ scheduler: {entity} scope={scope} failed: {res}")
+    return ok
+
+
+def run_forever():
+    workers = int(os.getenv("SCHED_WORKERS", "4"))
+    tick = float(os.getenv("SCHED_TICK_SECONDS", "30"))
+    run_migrations()
+
+    targets = {
+        name: seconds
+        for name, seconds in load_targets().items()
+        if name == "pages" or name in TASK_HANDLERS
+    }
+    logger.info(f"🚀 scheduler starting workers={workers} targets={targets}")
+
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        while True:
+            try:
+                user_token = get_config("META_USER_TOKEN")
+                if not user_token:
+                    logger.error("❌ META_USER_TOKEN missing in database 'sys_config' table")
+                else:
+                    accounts = query_dict("""
+                        SELECT a.ad_account_id, p.code AS portfolio_code
+                        FROM ad_accounts a
+                        JOIN portfolios p ON p.id = a.portfolio_id
+                        WHERE p.code IN ('RFM','MAGIC_EXTREME')
+                    """)
+                    busy = set(running.values())
+                    for ratio, entity, scope, acc in stale_items(targets, accounts, cadence_multiplier):
+                        if len(running) >= workers:
+                            break
+                        if (entity, scope) in busy:
+                            continue
+                        logger.info(f"⏱️ scheduling {entity} scope={scope} overdue={ratio:.1f}x")
+                        running[ex.submit(_refresh, user_token, entity, scope, acc)] = (entity, scope)
+                        busy.add((entity, scope))
+            except Exception as e:
+                logger.error(f"❌ scheduler tick failed: {e}")
+
+            if running:
+                done, _ = wait(running, timeout=tick, return_when=FIRST_COMPLETED)
+                for f in done:
+                    entity, scope = running.pop(f)
+                    try:
+                        f.result()
+                    except Exception as e:
+                        logger.error(f"❌ scheduler: {entity} scope={scope} crashed: {e}")
+            else:
+                time.sleep(tick)
+
+
+if __name__ == "__main__":
+    run_forever()
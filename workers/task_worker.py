@@ -0,0 +1,51 @@
+# task_worker.py
+"""
+Generic sync_tasks consumer; run one (or several) per host:
+
+    python -m workers.task_worker
+
+Claims any runnable task with SKIP LOCKED, keeps its lease alive while the
+account is processed, and sleeps when the queue is empty.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logs.logger import logger
+from db.migrations import run_migrations
+from db.config_store import get_config
+from db.repositories.sync_tasks_repo import claim_task, expire_exhausted_tasks
+from services.task_queue_service import (
+    LEASE_SECONDS,
+    POLL_SECONDS,
+    process_task,
+    worker_id,
+)
+
+
+def _loop():
+    owner = worker_id()
+    while True:
+        try:
+            task = claim_task(owner, LEASE_SECONDS)
+            if not task:
+                expire_exhausted_tasks()
+                time.sleep(POLL_SECONDS)
+                continue
+            process_task(task, owner, get_config("META_USER_TOKEN"))
+        except Exception as e:
+            logger.error(f"❌ task worker loop error owner={owner}: {e}")
+            time.sleep(POLL_SECONDS)
+
+
+def run_forever():
+    threads = int(os.getenv("TASK_WORKER_THREADS", "2"))
+    logger.info(f"🚀 task worker starting threads={threads}")
+    run_migrations()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        for _ in range(threads):
+            ex.submit(_loop)
+
+
+if __name__ == "__main__":
+    run_forever()